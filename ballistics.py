@@ -0,0 +1,373 @@
+"""
+ Meter ballistics for the Streaming Meter
+ Requirements: python-numpy, python-scipy (lufs mode only)
+ Standard meter readings computed from consecutive blocks of interleaved paInt16 audio. Every
+ meter keeps its filter and envelope state between blocks, so blocks of any size can be fed
+ as the audio arrives and the reading is the same as metering one continuous signal.
+
+   vu       - VU, rectified average reaching 99% of a steady tone in 300 ms
+   ppm      - EBU PPM (IEC 60268-10 type IIb), 10 ms integration, falls 20 dB in 1.7 s
+   ppm-bbc  - BBC PPM (IEC 60268-10 type IIa), 10 ms integration, falls 24 dB in 2.8 s
+   truepeak - ITU-R BS.1770 true-peak, 4x oversampled, falls like the EBU PPM
+   lufs     - ITU-R BS.1770 loudness, momentary (400 ms), short-term (3 s) and integrated
+
+ The per sample work (filtering, rectifying, peak finding) is done with numpy on the whole
+ block. Only the envelopes are stepped in python and only at their control rate of one step
+ per millisecond or so, never per sample.
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+import meter_levels
+
+MODES = ('sample', 'vu', 'ppm', 'ppm-bbc', 'truepeak', 'lufs')
+
+# rectified average of a sine is 2/pi of its amplitude, scaling by this makes a VU read the
+# RMS of a steady sine like the analogue meter calibrated on one
+SINE_AVERAGE_TO_RMS = math.pi / (2 * math.sqrt(2))
+
+
+def create_ballistics(mode, sample_rate, channels):
+    """
+    Create the meter for a metering mode
+    :param mode: one of MODES
+    :param sample_rate: sample rate of the metered audio
+    :param channels: number of interleaved channels
+    :return: Ballistics, None for 'sample' which keeps the plain block sample peak
+    """
+    if mode == 'sample':
+        return None
+    if mode == 'vu':
+        return VUBallistics(sample_rate, channels)
+    if mode == 'ppm':
+        return PPMBallistics(sample_rate, channels, standard='ebu')
+    if mode == 'ppm-bbc':
+        return PPMBallistics(sample_rate, channels, standard='bbc')
+    if mode == 'truepeak':
+        return TruePeakBallistics(sample_rate, channels)
+    if mode == 'lufs':
+        return LoudnessBallistics(sample_rate, channels)
+    raise ValueError("Invalid meter mode '{}', expecting one of {}".format(mode, ', '.join(MODES)))
+
+
+class Ballistics:
+    """ Base class of the meters, process() takes the audio in blocks and returns the reading """
+    mode = None
+    unit = 'dBFS'
+
+    def __init__(self, sample_rate, channels):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.reading = np.full(channels, meter_levels.to_dbfs(0.0))
+
+    def process(self, pcm):
+        """
+        Meter the next block of audio
+        :param pcm: int16 array of shape (frames, channels), e.g. from meter_levels.pcm_view()
+        :return: numpy array with the reading of every channel in dB after the block
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        self.reading = np.full(self.channels, meter_levels.to_dbfs(0.0))
+
+    @staticmethod
+    def _normalize(pcm):
+        return pcm.astype(np.float64) / meter_levels.FULL_SCALE
+
+
+class _SteppedBallistics(Ballistics):
+    """
+    Meter whose envelope is stepped once per step_seconds of audio. Frames that do not fill a
+    whole step are kept and metered with the next block
+    """
+    step_seconds = 0.001
+
+    def __init__(self, sample_rate, channels):
+        super().__init__(sample_rate, channels)
+        self.step_frames = max(1, int(round(sample_rate * self.step_seconds)))
+        self.step_seconds = self.step_frames / sample_rate
+        self.envelope = np.zeros(channels)
+        self._pending = np.empty((0, channels))
+
+    def reset(self):
+        super().reset()
+        self.envelope = np.zeros(self.channels)
+        self._pending = np.empty((0, self.channels))
+
+    def process(self, pcm):
+        samples = self._normalize(pcm)
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        steps = len(samples) // self.step_frames
+        self._pending = samples[steps * self.step_frames:]
+        if steps:
+            blocks = samples[:steps * self.step_frames].reshape(steps, self.step_frames,
+                                                                self.channels)
+            detected = self._detect(blocks)
+            for channel in range(self.channels):
+                # plain floats, numpy calls on single values cost more than the math
+                self.envelope[channel] = self._follow(float(self.envelope[channel]),
+                                                      detected[:, channel].tolist())
+            self.reading = meter_levels.to_dbfs(self.envelope)
+        return self.reading
+
+    def _detect(self, blocks):
+        """
+        :param blocks: float array of shape (steps, step_frames, channels)
+        :return: array of shape (steps, channels), the detector output of every step
+        """
+        raise NotImplementedError
+
+    def _follow(self, envelope, values):
+        """
+        :param envelope: envelope of the channel before the steps
+        :param values: detector output of the channel, one float per step
+        :return: envelope after the steps
+        """
+        raise NotImplementedError
+
+
+class VUBallistics(_SteppedBallistics):
+    """ VU meter, a rectified average with 300 ms integration time (IEC 60268-17) """
+    mode = 'vu'
+    step_seconds = 0.005
+
+    def __init__(self, sample_rate, channels, integration_seconds=0.3):
+        super().__init__(sample_rate, channels)
+        # one pole reaching 99% of the final reading after integration_seconds
+        time_constant = integration_seconds / math.log(100)
+        self.coefficient = 1 - math.exp(-self.step_seconds / time_constant)
+
+    def _detect(self, blocks):
+        return np.abs(blocks).mean(axis=1) * SINE_AVERAGE_TO_RMS
+
+    def _follow(self, envelope, values):
+        coefficient = self.coefficient
+        for value in values:
+            envelope += (value - envelope) * coefficient
+        return envelope
+
+
+class PPMBallistics(_SteppedBallistics):
+    """ Quasi-peak programme meter, fast attack and slow linear-in-dB fall back """
+    mode = 'ppm'
+    # integration time, fall back in dB per second
+    STANDARDS = {'ebu': (0.010, 20 / 1.7),
+                 'bbc': (0.010, 24 / 2.8)}
+
+    def __init__(self, sample_rate, channels, standard='ebu'):
+        super().__init__(sample_rate, channels)
+        if standard not in self.STANDARDS:
+            raise ValueError("Invalid PPM standard '{}'".format(standard))
+        self.mode = 'ppm' if standard == 'ebu' else 'ppm-' + standard
+        integration, fall_db = self.STANDARDS[standard]
+        # a tone burst of the integration time reads 1 dB below the steady tone
+        time_constant = integration / -math.log(1 - 10 ** (-1 / 20))
+        self.attack = 1 - math.exp(-self.step_seconds / time_constant)
+        self.release = 10 ** (-fall_db * self.step_seconds / 20)
+
+    def _detect(self, blocks):
+        return np.abs(blocks).max(axis=1)
+
+    def _follow(self, envelope, values):
+        attack = self.attack
+        release = self.release
+        for value in values:
+            if value > envelope:
+                envelope += (value - envelope) * attack
+            else:
+                envelope = max(envelope * release, value)
+        return envelope
+
+
+class TruePeakBallistics(Ballistics):
+    """
+    True-peak meter (ITU-R BS.1770 annex 2). The audio is oversampled 4x with a 48 tap
+    polyphase interpolation filter so peaks between the samples are caught. The reading holds
+    the highest peak and falls back like the EBU PPM
+    """
+    mode = 'truepeak'
+    unit = 'dBTP'
+    OVERSAMPLING = 4
+    TAPS = 48
+
+    def __init__(self, sample_rate, channels, fall_db=20 / 1.7):
+        super().__init__(sample_rate, channels)
+        self.fall_db = fall_db
+        self.phases = self.interpolation_filter()
+        self.taps_per_phase = self.phases.shape[1]
+        self.envelope = np.zeros(channels)
+        self._history = np.zeros((self.taps_per_phase - 1, channels))
+
+    @classmethod
+    def interpolation_filter(cls):
+        """
+        Windowed sinc low pass at the original Nyquist frequency, split into its phases
+        :return: array of shape (OVERSAMPLING, TAPS // OVERSAMPLING), every phase has unity gain
+        """
+        taps = np.arange(cls.TAPS) - (cls.TAPS - 1) / 2
+        kernel = np.sinc(taps / cls.OVERSAMPLING) * np.kaiser(cls.TAPS, 6.0)
+        phases = kernel.reshape(-1, cls.OVERSAMPLING).T[:, ::-1].copy()
+        return phases / phases.sum(axis=1, keepdims=True)
+
+    def reset(self):
+        super().reset()
+        self.envelope = np.zeros(self.channels)
+        self._history = np.zeros((self.taps_per_phase - 1, self.channels))
+
+    def process(self, pcm):
+        frames = len(pcm)
+        if not frames:
+            return self.reading
+        samples = np.concatenate((self._history, self._normalize(pcm)))
+        self._history = samples[frames:]
+
+        # a strided (channels, frames, taps) view holds the filter input of every output frame
+        # without copying, one matrix product then interpolates all phases of the block
+        samples = np.ascontiguousarray(samples.T)
+        step = samples.strides[1]
+        windows = as_strided(samples, shape=(self.channels, frames, self.taps_per_phase),
+                             strides=(samples.strides[0], step, step))
+        oversampled = np.matmul(windows, self.phases.T)
+        peak = np.abs(oversampled).max(axis=(1, 2))
+
+        fallen = self.envelope * 10 ** (-self.fall_db * frames / self.sample_rate / 20)
+        self.envelope = np.maximum(peak, fallen)
+        self.reading = meter_levels.to_dbfs(self.envelope)
+        return self.reading
+
+
+class LoudnessBallistics(Ballistics):
+    """
+    ITU-R BS.1770 / EBU R 128 loudness meter. The audio is K-weighted and its mean square is
+    collected in 100 ms hops, momentary loudness covers the last 4 hops and short-term the
+    last 30. Integrated loudness uses the gated 400 ms blocks of the whole programme, kept as a
+    histogram of block counts and summed mean squares so memory stays constant however long
+    the meter runs. The bins only decide the relative gate, the mean itself is exact
+    """
+    mode = 'lufs'
+    unit = 'LUFS'
+    HOP_SECONDS = 0.1
+    MOMENTARY_HOPS = 4
+    SHORT_TERM_HOPS = 30
+    ABSOLUTE_GATE = -70.0
+    RELATIVE_GATE = -10.0
+    HISTOGRAM_STEP = 0.1  # LU per integrated loudness histogram bin
+    HISTOGRAM_TOP = 5.0
+
+    def __init__(self, sample_rate, channels, channel_weights=None):
+        super().__init__(sample_rate, channels)
+        try:
+            from scipy import signal
+        except ImportError:
+            raise ImportError("the lufs meter mode requires python-scipy")
+        self._sosfilt = signal.sosfilt
+        self.sos = self.k_weighting(sample_rate)
+        # left, right and centre count once. Surround channels would be weighted 1.41
+        self.channel_weights = np.asarray(channel_weights or [1.0] * channels, dtype=np.float64)
+        self.hop_frames = int(round(sample_rate * self.HOP_SECONDS))
+        bins = int(round((self.HISTOGRAM_TOP - self.ABSOLUTE_GATE) / self.HISTOGRAM_STEP))
+        self._histogram = np.zeros(bins, dtype=np.int64)
+        self._histogram_power = np.zeros(bins)
+        self.momentary = self.short_term = _loudness(0.0)
+        self.reset()
+
+    @staticmethod
+    def k_weighting(sample_rate):
+        """
+        K-weighting pre-filter and RLB high pass of BS.1770 for any sample rate, designed from
+        their analogue prototypes with the bilinear transform
+        :param sample_rate: sample rate of the metered audio
+        :return: second order sections for scipy.signal.sosfilt
+        """
+        # high shelf, +4 dB above about 1.7 kHz
+        f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+        k = math.tan(math.pi * f0 / sample_rate)
+        vh = 10 ** (gain / 20)
+        vb = vh ** 0.4996667741545416
+        a0 = 1 + k / q + k * k
+        shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0,
+                 (vh - vb * k / q + k * k) / a0,
+                 1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+        # high pass at about 38 Hz
+        f0, q = 38.13547087602444, 0.5003270373238773
+        k = math.tan(math.pi * f0 / sample_rate)
+        a0 = 1 + k / q + k * k
+        high_pass = [1.0, -2.0, 1.0,
+                     1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+        return np.array([shelf, high_pass])
+
+    def reset(self):
+        super().reset()
+        self._zi = np.zeros((len(self.sos), 2, self.channels))
+        self._hop_energy = 0.0
+        self._hop_fill = 0
+        self._hops = np.zeros(self.SHORT_TERM_HOPS)
+        self._hop_count = 0
+        self._histogram[:] = 0
+        self._histogram_power[:] = 0
+        self.momentary = self.short_term = _loudness(0.0)
+
+    def process(self, pcm):
+        if not len(pcm):
+            return self.reading
+        weighted, self._zi = self._sosfilt(self.sos, self._normalize(pcm), axis=0, zi=self._zi)
+        # weighted sum of the channel powers, one value per frame
+        power = np.einsum('ij,ij,j->i', weighted, weighted, self.channel_weights)
+
+        # sum the block hop by hop, a python step per 100 ms hop and not per frame
+        start = 0
+        while start < len(power):
+            take = min(self.hop_frames - self._hop_fill, len(power) - start)
+            self._hop_energy += power[start:start + take].sum()
+            self._hop_fill += take
+            start += take
+            if self._hop_fill == self.hop_frames:
+                self._complete_hop(self._hop_energy / self.hop_frames)
+                self._hop_energy = 0.0
+                self._hop_fill = 0
+
+        self.reading = np.full(self.channels, self.momentary)
+        return self.reading
+
+    def _complete_hop(self, mean_square):
+        self._hops[self._hop_count % self.SHORT_TERM_HOPS] = mean_square
+        self._hop_count += 1
+        if self._hop_count < self.MOMENTARY_HOPS:
+            return
+
+        recent = [(self._hop_count - 1 - hop) % self.SHORT_TERM_HOPS
+                  for hop in range(self.MOMENTARY_HOPS)]
+        block_power = self._hops[recent].mean()
+        self.momentary = _loudness(block_power)
+        self.short_term = _loudness(self._hops[:min(self._hop_count, self.SHORT_TERM_HOPS)]
+                                    .mean())
+
+        # every momentary block is a 400 ms gating block overlapping the previous one by 75%
+        if self.momentary > self.ABSOLUTE_GATE:
+            index = min(int((self.momentary - self.ABSOLUTE_GATE) / self.HISTOGRAM_STEP),
+                        len(self._histogram) - 1)
+            self._histogram[index] += 1
+            self._histogram_power[index] += block_power
+
+    @property
+    def integrated(self):
+        """
+        Gated integrated loudness of everything metered since the last reset
+        :return: LUFS, None until a block above the absolute gate was metered
+        """
+        blocks = self._histogram.sum()
+        if not blocks:
+            return None
+        relative_gate = _loudness(self._histogram_power.sum() / blocks) + self.RELATIVE_GATE
+        first = max(0, int(math.ceil((relative_gate - self.ABSOLUTE_GATE) / self.HISTOGRAM_STEP)))
+        blocks = self._histogram[first:].sum()
+        if not blocks:
+            return None
+        return float(_loudness(self._histogram_power[first:].sum() / blocks))
+
+
+def _loudness(mean_square):
+    return -0.691 + 10 * np.log10(mean_square + meter_levels.SILENCE_FLOOR)
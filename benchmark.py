@@ -0,0 +1,503 @@
+#!/usr/bin/python
+"""
+ Benchmark
+ Requirements: python-numpy, python-pygame, python-requests
+ Measures the hot paths of the Streaming Meter on any machine, no Pi, sound device or Icecast
+ server needed. A seeded synthetic PCM source stands in for PyAudio, pygame draws with SDL's
+ dummy video driver and IcecastInfo polls a fake Icecast server on localhost. Every stage
+ reports calls per second (frames per second for the frame stage), latency percentiles and
+ the memory allocated per call. Save the results of a commit with --json and compare a later
+ run against them with --compare to catch regressions before deploying:
+
+   benchmark.py --json before.json
+   benchmark.py --compare before.json
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import threading
+import subprocess
+import tracemalloc
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+# must be set before pygame is imported anywhere
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import streaming_meter
+from streaming_meter import VUMeter, IcecastInfo, IcecastMount, IcecastSnapshot
+
+AUDIO_STAGES = ('levels', 'read_stream_ring', 'read_stream_blocking')
+DISPLAY_STAGES = ('db_window', 'stats_window', 'frame')
+ICECAST_STAGES = ('icecast_global', 'icecast_global_tree', 'icecast_mount')
+STAGES = AUDIO_STAGES + DISPLAY_STAGES + ICECAST_STAGES
+
+
+class Args:
+    """
+    Args Class handles the cmdline arguments passed to the code
+    """
+    def __init__(self, argv=None):
+        argparser = argparse.ArgumentParser(description="Streaming Meter benchmark")
+        argparser.add_argument('-s', '--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                               help='stages to run, all by default')
+        argparser.add_argument('--seed', type=int, default=0,
+                               help='seed of the synthetic audio and listener counts')
+        argparser.add_argument('--iterations', type=int, default=2000,
+                               help='timed calls per audio and display stage')
+        argparser.add_argument('--icecast-iterations', type=int, default=200,
+                               help='timed polls per Icecast stage')
+        argparser.add_argument('--channels', type=int, default=1,
+                               help='channels of the synthetic audio, the meter uses 1')
+        argparser.add_argument('--meter-mode', default='sample',
+                               help='VUMeter meter_mode, see ballistics.MODES')
+        argparser.add_argument('--hop', type=float, default=0.0,
+                               help='VUMeter hop_seconds, 0 meters whole blocks')
+        argparser.add_argument('--spectrum', action='store_true',
+                               help='also calculate the spectrum in the audio stages')
+        argparser.add_argument('--stats-change', type=int, default=30,
+                               help='frames between changes of the drawn Icecast stats')
+        argparser.add_argument('--mounts', type=int, default=10,
+                               help='mounts on the fake Icecast server')
+        argparser.add_argument('--listeners', type=int, default=50,
+                               help='<listener> entries per mount on the fake Icecast server')
+        argparser.add_argument('--latency', type=float, default=0.0,
+                               help='seconds the fake Icecast server waits before answering')
+        argparser.add_argument('--static-stats', action='store_true',
+                               help='the fake Icecast server answers every poll identically')
+        argparser.add_argument('--json', dest='json_out',
+                               help='write the results to this file')
+        argparser.add_argument('--compare',
+                               help='compare against the results of an earlier --json run')
+        argparser.add_argument('--threshold', type=float, default=20.0,
+                               help='percent a median may grow before --compare reports a '
+                                    'regression')
+        cmd_args = argparser.parse_args(argv)
+        self.stages = cmd_args.stages
+        self.seed = cmd_args.seed
+        self.iterations = cmd_args.iterations
+        self.icecast_iterations = cmd_args.icecast_iterations
+        self.channels = cmd_args.channels
+        self.meter_mode = cmd_args.meter_mode
+        self.hop = cmd_args.hop
+        self.spectrum = cmd_args.spectrum
+        self.stats_change = cmd_args.stats_change
+        self.mounts = cmd_args.mounts
+        self.listeners = cmd_args.listeners
+        self.latency = cmd_args.latency
+        self.static_stats = cmd_args.static_stats
+        self.json_out = cmd_args.json_out
+        self.compare = cmd_args.compare
+        self.threshold = cmd_args.threshold
+
+
+class SyntheticPCM:
+    """
+    Seeded, endlessly looping paInt16 audio standing in for a PyAudio input stream: a tone
+    over noise with a slowly changing level and an occasional clipped sample, so peaks,
+    levels and clip counts all move like they do on air
+    """
+
+    def __init__(self, sample_rate=44100, channels=1, seconds=10, seed=0):
+        rng = np.random.RandomState(seed)
+        frames = int(sample_rate * seconds)
+        t = np.arange(frames) / sample_rate
+        envelope = 0.5 + 0.45 * np.sin(2 * np.pi * 0.3 * t)
+        tone = 0.4 * np.sin(2 * np.pi * 440 * t)
+        signal = envelope * (tone + 0.1 * rng.standard_normal(frames))
+        signal[rng.randint(0, frames, size=seconds)] = 1.0
+        pcm = np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+        self.data = np.repeat(pcm[:, None], channels, axis=1).tobytes()
+        self.frame_bytes = 2 * channels
+        self.pos = 0
+
+    def chunk(self, size):
+        """
+        :param size: bytes, whole frames
+        :return: the next size bytes of the loop
+        """
+        if self.pos + size > len(self.data):
+            self.pos = 0
+        data = self.data[self.pos:self.pos + size]
+        self.pos += size
+        return data
+
+    def read(self, frames, exception_on_overflow=True):
+        """ pyaudio.Stream.read() """
+        return self.chunk(frames * self.frame_bytes)
+
+    def get_read_available(self):
+        """ pyaudio.Stream.get_read_available(), the synthetic audio never queues up """
+        return 0
+
+
+class FakeIcecast:
+    """
+    Local HTTP server answering /admin/stats.xml and /admin/stats?mount= like Icecast does.
+    The configured mount is the last one in stats.xml, the worst case for the streaming
+    parser. Unless static, the listener count of that mount changes on every request so the
+    unchanged-body shortcut is not taken
+    """
+    MOUNT = 'kgro'
+
+    def __init__(self, mounts=10, listeners=50, latency=0.0, static=False, seed=0):
+        self.mounts = mounts
+        self.listeners = listeners
+        self.latency = latency
+        self.static = static
+        self.rng = np.random.RandomState(seed)
+        self.requests = 0
+        self.server = None
+
+    def _source(self, mount, listeners):
+        entries = ''.join(
+            '<listener id="{0}"><IP>10.0.{1}.{2}</IP><UserAgent>VLC/3.0.{0}</UserAgent>'
+            '<Connected>{3}</Connected></listener>'.format(index, index // 250, index % 250,
+                                                           index * 7)
+            for index in range(self.listeners))
+        return ('<source mount="/{0}"><server_description>Benchmark {0}</server_description>'
+                '<stream_start>Mon, 05 Jan 2026 06:00:00 +0000</stream_start>'
+                '<listeners>{1}</listeners><listener_peak>{2}</listener_peak>'
+                '<slow_listeners>0</slow_listeners>{3}</source>'.format(mount, listeners,
+                                                                          listeners + 10,
+                                                                          entries))
+
+    def body(self, mount=None):
+        listeners = self.listeners if self.static else int(self.rng.randint(0, 1000))
+        target = self._source(self.MOUNT, listeners)
+        if mount is not None:
+            sources = target if mount == '/' + self.MOUNT else ''
+        else:
+            sources = ''.join(self._source('mount{}'.format(index), self.listeners)
+                              for index in range(self.mounts - 1)) + target
+        return ('<?xml version="1.0"?><icestats><admin>admin@localhost</admin>'
+                '<server_start>Mon, 05 Jan 2026 05:00:00 +0000</server_start>{}'
+                '</icestats>'.format(sources)).encode('utf8')
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive like Icecast, requests reuses it
+            # headers and body go out in separate writes, without this every poll waits for
+            # the delayed ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                fake.requests += 1
+                path, _, query = self.path.partition('?')
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if path == '/admin/stats.xml':
+                    body = fake.body()
+                elif path == '/admin/stats' and query.startswith('mount='):
+                    body = fake.body(mount=query[len('mount='):].replace('%2F', '/'))
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/xml')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, name='FakeIcecast',
+                         daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def measure(func, iterations, warmup=20, alloc_iterations=200):
+    """
+    Time every call of func, then count the memory it allocates with tracemalloc in a
+    separate pass so the tracing does not skew the timings
+    :param func: callable without arguments
+    :param iterations: timed calls
+    :param warmup: untimed calls before timing, fills caches and pools
+    :param alloc_iterations: calls traced for allocations
+    :return: dict of results
+    """
+    for _ in range(warmup):
+        func()
+
+    gc.collect()
+    times = np.empty(iterations)
+    clock = time.perf_counter
+    started = clock()
+    for index in range(iterations):
+        call_start = clock()
+        func()
+        times[index] = clock() - call_start
+    total = clock() - started
+
+    alloc_iterations = min(alloc_iterations, iterations)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(alloc_iterations):
+        func()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1e6
+    return {'iterations': iterations,
+            'per_second': iterations / total,
+            'p50_us': p50,
+            'p90_us': p90,
+            'p99_us': p99,
+            'max_us': times.max() * 1e6,
+            'alloc_peak_kib': (peak - before) / 1024.0,
+            'alloc_net_bytes': (after - before) / alloc_iterations}
+
+
+def make_vu_meter(args, source, blocking=False):
+    vu_meter = VUMeter(sample_rate=streaming_meter.SAMPLERATE,
+                       channels=args.channels,
+                       buffer_size=4096 if not args.hop else
+                       min(4096, int(streaming_meter.SAMPLERATE * args.hop)),
+                       record_seconds=0.2,
+                       use_callback=True,
+                       input_source='pipe',
+                       meter_mode=args.meter_mode,
+                       hop_seconds=args.hop or None,
+                       spectrum=args.spectrum)
+    if blocking:
+        # the blocking read path with the synthetic source in place of the pyaudio stream
+        vu_meter.use_callback = False
+        vu_meter.stream = source
+    return vu_meter
+
+
+def bench_audio(args, results):
+    source = SyntheticPCM(streaming_meter.SAMPLERATE, args.channels, seed=args.seed)
+
+    if 'levels' in args.stages:
+        vu_meter = make_vu_meter(args, source)
+        block = len(vu_meter._capture)
+
+        def levels():
+            data = source.chunk(block)
+            vu_meter._get_current_levels(data, data)
+        results['levels'] = measure(levels, args.iterations)
+
+    if 'read_stream_ring' in args.stages:
+        vu_meter = make_vu_meter(args, source)
+        chunk = vu_meter.buffer_size * vu_meter.channels * vu_meter.SAMPLE_WIDTH
+
+        def read_ring():
+            # one callback chunk arrives per read, like a 30 fps reader keeping up
+            vu_meter.feed(source.chunk(chunk))
+            vu_meter.read_stream()
+        results['read_stream_ring'] = measure(read_ring, args.iterations)
+
+    if 'read_stream_blocking' in args.stages:
+        vu_meter = make_vu_meter(args, source, blocking=True)
+        results['read_stream_blocking'] = measure(vu_meter.read_stream, args.iterations)
+
+
+def stats_snapshots(count=4):
+    """
+    :param count: number of different snapshots
+    :return: IcecastSnapshots that differ in their listener counts
+    """
+    class Server:
+        mount_point = FakeIcecast.MOUNT
+
+    fake = FakeIcecast(mounts=1, listeners=0, static=True)
+    snapshots = []
+    for index in range(count):
+        fake.listeners = index
+        source = ET.fromstring(fake.body()).find('source')
+        snapshots.append(IcecastSnapshot(server_start='Mon, 05 Jan 2026 05:00:00 +0000',
+                                         Mount=IcecastMount(source, Server()),
+                                         refresh_time=None))
+    return snapshots
+
+
+def bench_display(args, results):
+    from pygame_display import PygameRenderer
+    renderer = PygameRenderer(streaming_meter.WINDOWWIDTH, streaming_meter.WINDOWHEIGHT,
+                              version=streaming_meter.version)
+    renderer.open()
+
+    # a deterministic walk over the meter range, the bars move on most frames like on air
+    rng = np.random.RandomState(args.seed)
+    levels = np.clip(np.cumsum(rng.randint(-4, 5, size=(997, 2)), axis=0) % 60 - 10,
+                     0, 41).tolist()
+    snapshots = stats_snapshots()
+
+    class Mount:
+        mount_point = FakeIcecast.MOUNT
+        snapshot = snapshots[0]
+    mount = Mount()
+    frame = [0]
+
+    def next_frame():
+        frame[0] += 1
+        mount.snapshot = snapshots[(frame[0] // max(1, args.stats_change)) % len(snapshots)]
+        return levels[frame[0] % len(levels)]
+
+    try:
+        if 'db_window' in args.stages:
+            def db_window():
+                level_left, level_right = next_frame()
+                renderer.db_window.draw(LevelL=level_left, LevelR=level_right)
+            results['db_window'] = measure(db_window, args.iterations)
+
+        if 'stats_window' in args.stages:
+            def stats_window():
+                next_frame()
+                renderer.stats_window.draw(mount)
+            results['stats_window'] = measure(stats_window, args.iterations)
+
+        if 'frame' in args.stages:
+            def whole_frame():
+                # a frame of MeterRuntime.render_task that also redraws the stats, the slowest kind
+                level_left, level_right = next_frame()
+                renderer.poll_events()
+                dirty_rects = renderer.draw_levels(level_left, level_right)
+                dirty_rects += renderer.draw_stats(mount)
+                renderer.update(dirty_rects)
+            results['frame'] = measure(whole_frame, args.iterations)
+    finally:
+        renderer.close()
+
+
+def bench_icecast(args, results):
+    try:
+        import requests  # noqa: F401, IcecastInfo imports it on the first poll
+    except ImportError:
+        sys.stderr.write("requests is not installed, skipping the Icecast stages\n")
+        return
+
+    fake = FakeIcecast(mounts=args.mounts, listeners=args.listeners, latency=args.latency,
+                       static=args.static_stats, seed=args.seed)
+    port = fake.start()
+
+    def poller(**kwargs):
+        return IcecastInfo('benchmark', '127.0.0.1', port, FakeIcecast.MOUNT, 'admin', 'hackme',
+                           **kwargs)
+    try:
+        if 'icecast_global' in args.stages:
+            ics = poller(per_mount=False, stream_parse=True, server_refresh_rate=0)
+            results['icecast_global'] = measure(ics.run, args.icecast_iterations, warmup=5,
+                                                alloc_iterations=50)
+        if 'icecast_global_tree' in args.stages:
+            ics = poller(per_mount=False, stream_parse=False, server_refresh_rate=0)
+            results['icecast_global_tree'] = measure(ics.run, args.icecast_iterations,
+                                                     warmup=5, alloc_iterations=50)
+        if 'icecast_mount' in args.stages:
+            ics = poller(per_mount=True, server_refresh_rate=1e9)
+            results['icecast_mount'] = measure(ics.run, args.icecast_iterations, warmup=5,
+                                               alloc_iterations=50)
+    finally:
+        fake.stop()
+
+
+def environment(args):
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'version': streaming_meter.version,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor() or platform.machine(),
+            'args': {key: value for key, value in vars(args).items()
+                     if key not in ('json_out', 'compare', 'threshold')}}
+
+
+def print_results(results, out):
+    out.write('{:<22}{:>12}{:>10}{:>10}{:>10}{:>10}{:>12}{:>12}\n'.format(
+        'stage', 'calls/s', 'p50 us', 'p90 us', 'p99 us', 'max us', 'peak KiB', 'net B/call'))
+    for stage in STAGES:
+        if stage not in results:
+            continue
+        result = results[stage]
+        out.write('{:<22}{:>12.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>12.1f}{:>12.1f}\n'.format(
+            stage, result['per_second'], result['p50_us'], result['p90_us'], result['p99_us'],
+            result['max_us'], result['alloc_peak_kib'], result['alloc_net_bytes']))
+
+
+def compare(results, run_args, baseline, threshold, out):
+    """
+    Print the change of the medians against an earlier run
+    :param results: results of this run
+    :param run_args: arguments of this run, as saved by environment()
+    :param baseline: dict loaded from an earlier --json file
+    :param threshold: percent a median may grow before it counts as a regression
+    :param out: text stream
+    :return: list of the stages that regressed
+    """
+    regressions = []
+    out.write('\ncompared to {} ({}):\n'.format(baseline.get('commit'),
+                                               baseline.get('version')))
+    if baseline.get('args') != run_args:
+        out.write('  note: the runs used different arguments\n')
+    for stage in STAGES:
+        if stage not in results or stage not in baseline['stages']:
+            continue
+        before = baseline['stages'][stage]['p50_us']
+        after = results[stage]['p50_us']
+        change = (after - before) / before * 100 if before else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(stage)
+        out.write('  {:<22}{:>10.1f} -> {:>10.1f} us  {:+7.1f}%{}\n'.format(stage, before, after,
+                                                                         change, flag))
+    return regressions
+
+
+def main():
+    args = Args()
+    results = {}
+    if any(stage in args.stages for stage in AUDIO_STAGES):
+        bench_audio(args, results)
+    if any(stage in args.stages for stage in DISPLAY_STAGES):
+        bench_display(args, results)
+    if any(stage in args.stages for stage in ICECAST_STAGES):
+        bench_icecast(args, results)
+
+    env = environment(args)
+    sys.stdout.write('commit {commit}, version {version}, python {python}, numpy {numpy}, '
+                     '{processor}\n'.format(**env))
+    print_results(results, sys.stdout)
+
+    if args.json_out:
+        with open(args.json_out, 'w') as json_file:
+            json.dump(dict(env, stages=results), json_file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as json_file:
+            baseline = json.load(json_file)
+        regressions = compare(results, env['args'], baseline, args.threshold, sys.stdout)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+ Display backends for the Streaming Meter
+ The meter only talks to a Renderer, the backend is picked by name from the config file:
+   pygame    the 480x280 pygame window, pygame is only imported when this is used
+   terminal  a single status line on a terminal, e.g. over ssh or on the Linux console
+   null      draws nothing, for headless boxes that only meter, poll and export metrics
+"""
+
+import sys
+
+
+class ColorPicker:
+    """ Used for pygame coloring to make it easier to pick a color by name instead of color code"""
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+    RED = (255, 50, 50)
+    YELLOW = (255, 255, 0)
+    GREEN = (0, 255, 50)
+    BLUE = (50, 50, 255)
+    GREY = (200, 200, 200)
+    ORANGE = (200, 100, 50)
+    CYAN = (0, 255, 255)
+    MAGENTA = (255, 0, 255)
+    TRANS = (1, 1, 1)
+
+
+class NullMountpoint:
+    """ This is a basic class to provide null values in the event the Icecast mount points
+    are not available"""
+
+    def __init__(self):
+        self.ServerDescription = "No description available"
+        self.StreamStart = "No Stream Start available"
+        self.Listeners = "No Listeners available"
+        self.ListenerPeak = "No Listener Peak available"
+        self.SlowListeners = "No Slow Listeners available"
+
+
+class Renderer:
+    """ Interface of a display backend """
+    # actions returned by poll_events()
+    QUIT = 'quit'
+    NEXT_PAGE = 'next_page'
+    PREVIOUS_PAGE = 'previous_page'
+    TOGGLE_DEBUG = 'toggle_debug'
+    REDRAW = 'redraw'  # the display was cleared, draw everything on the next frame
+
+    def open(self):
+        """
+        Create the display, called once before the first frame
+        :return: None
+        """
+
+    def draw_levels(self, level_left, level_right):
+        """
+        :param level_left: left channel level in meter segments
+        :param level_right: right channel level in meter segments
+        :return: list of dirty areas for update()
+        """
+        return []
+
+    def draw_spectrum(self, band_centers, band_levels):
+        """
+        :param band_centers: centre frequency of every band in Hz
+        :param band_levels: level of every band in dBFS
+        :return: list of dirty areas for update()
+        """
+        return []
+
+    def draw_inputs(self, frames):
+        """
+        :param frames: meter_inputs.LevelFrame of every input when several inputs are metered,
+                       to be compared side by side
+        :return: list of dirty areas for update()
+        """
+        return []
+
+    def draw_stats(self, ics, page=None, total_listeners=None):
+        """
+        :param ics: IcecastInfo of the mount to show
+        :param page: optional page label when paging through several mounts
+        :param total_listeners: optional listener count over all mounts
+        :return: list of dirty areas for update()
+        """
+        return []
+
+    def draw_debug(self, rows):
+        """
+        :param rows: table of the debug overlay, rows of text cells as returned by
+                     Probes.table_rows(). None removes the overlay
+        :return: list of dirty areas for update()
+        """
+        return []
+
+    def update(self, dirty_rects):
+        """
+        Push the dirty areas of the frame to the display
+        :param dirty_rects: list returned by the draw methods
+        :return: None
+        """
+
+    def poll_events(self):
+        """
+        :return: list of Renderer actions requested by the user since the last call
+        """
+        return []
+
+    def close(self):
+        """
+        Tear down the display
+        :return: None
+        """
+
+
+class NullRenderer(Renderer):
+    """ Draws nothing """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class TerminalRenderer(Renderer):
+    """ Draws the meter as one status line that is rewritten in place """
+    SEGMENTS = 41  # same scale as the pygame meter, 41 segments = 0dBFS
+
+    def __init__(self, width=None, height=None, version="", stream=None, bar_width=20):
+        self.stream = stream if stream is not None else sys.stdout
+        self.bar_width = bar_width
+        self.levels = (0, 0)
+        self.inputs = ""
+        self.stats = ""
+        self.shown_line = None
+
+    def _bar(self, level):
+        lit = max(0, min(level, self.SEGMENTS)) * self.bar_width // self.SEGMENTS
+        return '#' * lit + '-' * (self.bar_width - lit)
+
+    def draw_levels(self, level_left, level_right):
+        self.levels = (level_left, level_right)
+        return []
+
+    def draw_inputs(self, frames):
+        self.inputs = " ".join("{} {:.0f}".format(frame.name, max(frame.meter_db))
+                               for frame in frames)
+        return []
+
+    def draw_stats(self, ics, page=None, total_listeners=None):
+        mount = ics.snapshot.Mount
+        listeners = mount.Listeners if mount else None
+        self.stats = "/{} listeners: {}".format(ics.mount_point, listeners)
+        if page is not None:
+            self.stats += " ({}, all mounts: {})".format(page, total_listeners)
+        return []
+
+    def update(self, dirty_rects):
+        line = "L [{}] R [{}] {}".format(self._bar(self.levels[0]), self._bar(self.levels[1]),
+                                         self.stats)
+        if self.inputs:
+            line += " | " + self.inputs
+        if line == self.shown_line:
+            return  # nothing changed, keep the terminal quiet
+        self.stream.write('\r\x1b[K' + line)
+        self.stream.flush()
+        self.shown_line = line
+
+    def close(self):
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+def create_renderer(backend, width, height, version=""):
+    """
+    Create the display backend selected in the config file
+    :param backend: 'pygame', 'terminal' or 'null'
+    :param width: window width in pixels
+    :param height: window height in pixels
+    :param version: version string shown by the backend
+    :return: Renderer
+    """
+    if backend == 'pygame':
+        # pygame is heavy to import and initialize, only pay for it when it is used
+        from pygame_display import PygameRenderer
+        return PygameRenderer(width, height, version=version)
+    elif backend == 'terminal':
+        return TerminalRenderer(width, height, version=version)
+    elif backend == 'null':
+        return NullRenderer(width, height, version=version)
+    raise ValueError("Unknown display backend '{}'".format(backend))
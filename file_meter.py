@@ -0,0 +1,196 @@
+#!/usr/bin/python
+"""
+ File Meter
+ Requirements: python-numpy, python-scipy (--loudness)
+ Meters recorded audio (WAV or raw signed 16 bit PCM) from a file, pipe or stdin as fast as
+ the CPU allows using the same level math as the Streaming Meter. One line is written per
+ window as CSV or JSON, e.g. to audit air-checks for clipping:
+
+   file_meter.py aircheck.wav --clips-only
+   arecord -f S16_LE -c 2 -r 44100 -t raw | file_meter.py - --format raw --format-out json
+   file_meter.py aircheck.wav --loudness > /dev/null
+"""
+
+import sys
+import json
+import wave
+import argparse
+import meter_levels
+import ballistics
+
+CHUNK_WINDOWS = 256  # windows read and analyzed per chunk
+
+
+class Args:
+    """
+    Args Class handles the cmdline arguments passed to the code
+    """
+    def __init__(self, argv=None):
+        argparser = argparse.ArgumentParser(description="Offline VU Meter")
+        argparser.add_argument('input', nargs='?', default='-',
+                               help='WAV or raw PCM file to meter, - for stdin (default)')
+        argparser.add_argument('-f', '--format', choices=['auto', 'wav', 'raw'], default='auto',
+                               help='input format, auto uses wav for *.wav files and raw '
+                                    'otherwise')
+        argparser.add_argument('-r', '--rate', type=int, default=44100,
+                               help='sample rate of raw input')
+        argparser.add_argument('-n', '--channels', type=int, default=2,
+                               help='channel count of raw input')
+        argparser.add_argument('-w', '--window', type=float, default=0.2,
+                               help='seconds per metered window, default matches the meter')
+        argparser.add_argument('-o', '--format-out', choices=['csv', 'json'], default='csv',
+                               help='csv with a header line or one JSON object per line')
+        argparser.add_argument('--clips-only', action='store_true',
+                               help='only write windows that contain full scale samples')
+        argparser.add_argument('--loudness', action='store_true',
+                               help='also measure the ITU-R BS.1770 integrated loudness and '
+                                    'true-peak of the whole input')
+        cmd_args = argparser.parse_args(argv)
+        self.input = cmd_args.input
+        self.format = cmd_args.format
+        if self.format == 'auto':
+            self.format = 'wav' if self.input.lower().endswith('.wav') else 'raw'
+        self.rate = cmd_args.rate
+        self.channels = cmd_args.channels
+        self.window = cmd_args.window
+        self.format_out = cmd_args.format_out
+        self.clips_only = cmd_args.clips_only
+        self.loudness = cmd_args.loudness
+
+
+class PCMReader:
+    """ Reads interleaved 16 bit PCM from a WAV or raw stream in chunks of whole frames """
+
+    def __init__(self, stream, fmt, rate=44100, channels=2):
+        self.wav = None
+        self.stream = stream
+        if fmt == 'wav':
+            self.wav = wave.open(stream, 'rb')
+            if self.wav.getsampwidth() != 2:
+                raise ValueError("only 16 bit WAV files are supported")
+            rate = self.wav.getframerate()
+            channels = self.wav.getnchannels()
+        self.rate = rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+
+    def read(self, frames):
+        """
+        :param frames: number of frames to read
+        :return: bytes, shorter than requested only at the end of the input
+        """
+        if self.wav is not None:
+            return self.wav.readframes(frames)
+
+        wanted = frames * self.frame_bytes
+        data = self.stream.read(wanted)
+        # pipes return short reads, keep reading until the chunk is complete or the input ends
+        while data and len(data) < wanted:
+            more = self.stream.read(wanted - len(data))
+            if not more:
+                break
+            data += more
+        return data[:len(data) - len(data) % self.frame_bytes]
+
+
+def channel_names(channels):
+    if channels == 2:
+        return ['L', 'R']
+    return ['ch{}'.format(channel) for channel in range(channels)]
+
+
+def meter(reader, out, window=0.2, format_out='csv', clips_only=False, meters=()):
+    """
+    Meter the whole input
+    :param reader: PCMReader
+    :param out: text stream the results are written to
+    :param window: seconds per window
+    :param format_out: 'csv' or 'json'
+    :param clips_only: only write windows with full scale samples
+    :param meters: ballistics.Ballistics instances fed the whole input as well
+    :return: (windows metered, windows with clipping)
+    """
+    window_frames = max(1, int(reader.rate * window))
+    names = channel_names(reader.channels)
+    if format_out == 'csv':
+        columns = ['time']
+        for name in names:
+            columns += ['peak_' + name, 'dbfs_' + name, 'clipped_' + name]
+        out.write(','.join(columns) + '\n')
+
+    index = 0
+    clip_windows = 0
+    while True:
+        data = reader.read(window_frames * CHUNK_WINDOWS)
+        if not data:
+            break
+        frames = len(data) // reader.frame_bytes
+        for ballistics_meter in meters:
+            ballistics_meter.process(meter_levels.pcm_view(data, reader.channels))
+        window_count = frames // window_frames
+        tail_frames = frames - window_count * window_frames
+        results = []
+        if window_count:
+            results.append((window_frames,) +
+                           meter_levels.window_levels(data, reader.channels, window_frames))
+        if tail_frames:
+            # the input ended in the middle of a window
+            tail = memoryview(data)[window_count * window_frames * reader.frame_bytes:]
+            results.append((tail_frames,) +
+                           meter_levels.window_levels(tail, reader.channels, tail_frames))
+
+        for frames_per_window, peak, rms, dbfs, clipped in results:
+            clipping = clipped.any(axis=1)
+            clip_windows += int(clipping.sum())
+            for row in range(len(peak)):
+                start = index / reader.rate
+                index += frames_per_window
+                if clips_only and not clipping[row]:
+                    continue
+                if format_out == 'csv':
+                    fields = ['{:.3f}'.format(start)]
+                    for channel in range(reader.channels):
+                        fields += ['{:.5f}'.format(peak[row, channel]),
+                                   '{:.2f}'.format(dbfs[row, channel]),
+                                   str(clipped[row, channel])]
+                    out.write(','.join(fields) + '\n')
+                else:
+                    line = {'time': round(start, 3)}
+                    for channel, name in enumerate(names):
+                        line[name] = {'peak': round(float(peak[row, channel]), 5),
+                                      'dbfs': round(float(dbfs[row, channel]), 2),
+                                      'clipped': int(clipped[row, channel])}
+                    out.write(json.dumps(line) + '\n')
+
+    return index // window_frames + (1 if index % window_frames else 0), clip_windows
+
+
+def main():
+    args = Args()
+    if args.input == '-':
+        stream = sys.stdin.buffer
+    else:
+        stream = open(args.input, 'rb')
+    try:
+        reader = PCMReader(stream, args.format, rate=args.rate, channels=args.channels)
+        meters = ()
+        if args.loudness:
+            meters = (ballistics.LoudnessBallistics(reader.rate, reader.channels),
+                      ballistics.TruePeakBallistics(reader.rate, reader.channels, fall_db=0))
+        windows, clip_windows = meter(reader, sys.stdout, window=args.window,
+                                      format_out=args.format_out, clips_only=args.clips_only,
+                                      meters=meters)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    sys.stderr.write("{} windows metered, {} with clipping\n".format(windows, clip_windows))
+    if meters:
+        loudness, true_peak = meters
+        integrated = loudness.integrated
+        sys.stderr.write("integrated loudness {}, true-peak {:.1f} dBTP\n".format(
+            'below gate' if integrated is None else '{:.1f} LUFS'.format(integrated),
+            true_peak.reading.max()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+ Multi-input metering for the Streaming Meter
+ Every configured input, e.g. the program feed, the stream return and an off-air receiver, is
+ captured and analyzed by its own worker process with its own VUMeter and PyAudio instance, so
+ the inputs spread over the cores of the Pi. A worker only publishes compact level frames into
+ a small block of shared memory, the display process reads the latest frame of every input
+ without locks, pipes or pickling and never loads pyaudio itself.
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+from collections import namedtuple
+import meter_levels
+
+# One [input:<name>] section of the config file
+InputConfig = namedtuple('InputConfig', ['name', 'device', 'channels'])
+
+# The latest levels of one input as read by the display process
+# dbfs and meter_db hold one value per channel
+LevelFrame = namedtuple('LevelFrame', ['name', 'time', 'level_left', 'level_right', 'dbfs',
+                                       'meter_db', 'clips', 'overflows', 'recoveries'])
+
+MAX_CHANNELS = 2
+STOP_POLL_SECONDS = 0.1  # longest a waiting worker takes to notice stop()
+# level of digital silence like the main meter shows it, finite so the metrics stay valid JSON
+SILENCE_DB = float(meter_levels.to_dbfs(0.0))
+
+
+class LevelFrameBuffer:
+    """
+    Shared memory slot holding the latest level frame of one input, written by the worker and
+    read by the display process. A sequence number that is odd while the worker writes lets the
+    reader detect and retry a frame that changed under it, neither side ever waits for the other
+    """
+    # offsets into the block of doubles
+    SEQUENCE, TIME, LEVEL_LEFT, LEVEL_RIGHT = range(4)
+    DBFS = 4
+    METER_DB = DBFS + MAX_CHANNELS
+    CLIPS = METER_DB + MAX_CHANNELS
+    OVERFLOWS = CLIPS + MAX_CHANNELS
+    RECOVERIES = OVERFLOWS + 1
+    SIZE = RECOVERIES + 1
+    READ_ATTEMPTS = 3
+
+    def __init__(self, context, name, channels):
+        """
+        :param context: multiprocessing context the workers are started with
+        :param name: input name
+        :param channels: channels of the input, at most MAX_CHANNELS
+        """
+        self.name = name
+        self.channels = channels
+        self.values = context.RawArray('d', self.SIZE)
+        self.seen = 0  # sequence number of the last frame read
+        self.frame = LevelFrame(name, 0.0, 0, 0, (SILENCE_DB,) * channels,
+                                (SILENCE_DB,) * channels, (0,) * channels, 0, 0)
+
+    def write(self, vu_meter, overflows=0, recoveries=0):
+        """
+        Publish the current levels of a VUMeter, called in the worker process
+        :param vu_meter: VUMeter
+        :param overflows: input overflows so far
+        :param recoveries: stream reopens so far
+        :return: None
+        """
+        values = self.values
+        values[self.SEQUENCE] += 1  # odd, a frame is being written
+        values[self.TIME] = time.time()
+        values[self.LEVEL_LEFT] = vu_meter.level_left
+        values[self.LEVEL_RIGHT] = vu_meter.level_right
+        for channel in range(self.channels):
+            values[self.DBFS + channel] = vu_meter.dbfs[channel]
+            values[self.METER_DB + channel] = vu_meter.meter_db[channel]
+            values[self.CLIPS + channel] = vu_meter.clips[channel]
+        values[self.OVERFLOWS] = overflows
+        values[self.RECOVERIES] = recoveries
+        values[self.SEQUENCE] += 1  # even again, the frame is complete
+
+    def clear(self):
+        """
+        Show silence, called in the worker process while its device is missing
+        :return: None
+        """
+        values = self.values
+        values[self.SEQUENCE] += 1
+        values[self.TIME] = time.time()
+        values[self.LEVEL_LEFT] = values[self.LEVEL_RIGHT] = 0
+        for channel in range(self.channels):
+            values[self.DBFS + channel] = values[self.METER_DB + channel] = SILENCE_DB
+        values[self.SEQUENCE] += 1
+
+    def settle(self):
+        """
+        Make the sequence even again before a new worker starts writing, a worker killed in the
+        middle of a frame leaves it odd and would turn the meaning of odd and even around
+        :return: None
+        """
+        values = self.values
+        values[self.SEQUENCE] += values[self.SEQUENCE] % 2
+
+    def read(self):
+        """
+        :return: the latest complete LevelFrame, the previous one when the worker is writing
+        """
+        values = self.values
+        channels = self.channels
+        for attempt in range(self.READ_ATTEMPTS):
+            sequence = values[self.SEQUENCE]
+            if sequence == self.seen:
+                break  # nothing new
+            if int(sequence) % 2:
+                continue  # the worker is in the middle of a frame
+            snapshot = values[:]
+            if values[self.SEQUENCE] != sequence:
+                continue  # the worker wrote a new frame while it was copied
+            self.frame = LevelFrame(
+                name=self.name,
+                time=snapshot[self.TIME],
+                level_left=int(snapshot[self.LEVEL_LEFT]),
+                level_right=int(snapshot[self.LEVEL_RIGHT]),
+                dbfs=tuple(snapshot[self.DBFS:self.DBFS + channels]),
+                meter_db=tuple(snapshot[self.METER_DB:self.METER_DB + channels]),
+                clips=tuple(int(clips) for clips in snapshot[self.CLIPS:self.CLIPS + channels]),
+                overflows=int(snapshot[self.OVERFLOWS]),
+                recoveries=int(snapshot[self.RECOVERIES]))
+            self.seen = sequence
+            break
+        return self.frame
+
+
+def _wait(stop, seconds):
+    """
+    Sleep in the worker until seconds passed or the display process asked it to stop
+    :param stop: shared stop flag
+    :param seconds: time to sleep
+    :return: True when the worker should stop
+    """
+    deadline = time.monotonic() + seconds
+    while not stop.value:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(remaining, STOP_POLL_SECONDS))
+    return True
+
+
+def _input_worker(config, meter_kwargs, frames, stop, rate):
+    """
+    Worker process of one input: captures and analyzes the audio and publishes level frames
+    until stop is set
+    :param config: InputConfig
+    :param meter_kwargs: VUMeter keyword arguments shared by all inputs
+    :param frames: LevelFrameBuffer of the input
+    :param stop: shared stop flag set by the display process
+    :param rate: level frames per second
+    :return: None
+    """
+    # Ctrl+C reaches the whole process group, the display process stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from streaming_meter import VUMeter, AudioStreamError
+
+    vu_meter = None
+    delay = 0.1
+    while vu_meter is None:
+        try:
+            vu_meter = VUMeter(channels=config.channels, device_names=(config.device,),
+                               **meter_kwargs)
+            vu_meter.open_stream()
+        except (IOError, OSError, ValueError) as e:
+            print("input {} not available: {}".format(config.name, e))
+            vu_meter = None
+            # PortAudio only lists the devices present when it starts
+            VUMeter.reset_pa()
+            if _wait(stop, delay):
+                return
+            delay = min(delay * 2, 5.0)
+    counters = vu_meter.probes.counters
+    period = 1.0 / rate
+    try:
+        while not stop.value:
+            try:
+                vu_meter.read_stream()
+            except AudioStreamError as e:
+                print("input {}: {}".format(config.name, e))
+                frames.clear()
+                delay = 0.1
+                while not stop.value:
+                    try:
+                        vu_meter.recover()
+                        break
+                    except (IOError, OSError, ValueError) as e:
+                        print("input {} not available: {}".format(config.name, e))
+                        _wait(stop, delay)
+                        delay = min(delay * 2, 5.0)
+                continue
+            frames.write(vu_meter,
+                         overflows=counters.get('audio_overflows', 0),
+                         recoveries=counters.get('audio_reopens', 0) +
+                         counters.get('audio_reinits', 0))
+            # the callback fills the ring in the background, like the single input runtime
+            # there is no point analyzing it more often than the levels are drawn
+            _wait(stop, period)
+    finally:
+        vu_meter.close_stream()
+
+
+class InputFanIn:
+    """ Runs one worker process per input and collects their latest level frames """
+
+    def __init__(self, inputs, meter_kwargs, rate=30, device_cache=None):
+        """
+        :param inputs: list of InputConfig, the first one drives the main meter
+        :param meter_kwargs: VUMeter keyword arguments shared by all inputs, without channels
+        :param rate: level frames per second of every worker
+        :param device_cache: device cache file, every input gets its own file next to it
+        """
+        # spawned workers start clean instead of inheriting the display, the poller threads
+        # and the exporter of this process
+        self.context = multiprocessing.get_context('spawn')
+        self.inputs = list(inputs)
+        self.meter_kwargs = meter_kwargs
+        self.rate = rate
+        self.device_cache = device_cache
+        # a plain shared flag rather than an Event, a worker that dies while waiting on an
+        # Event can leave its lock held and stop() would then hang
+        self.stop_flag = self.context.RawValue('b', 0)
+        self.buffers = [LevelFrameBuffer(self.context, config.name,
+                                         min(config.channels, MAX_CHANNELS))
+                        for config in self.inputs]
+        self.workers = [None] * len(self.inputs)
+        self.restarts = 0
+
+    def _device_cache(self, config):
+        if not self.device_cache:
+            return None
+        root, ext = os.path.splitext(self.device_cache)
+        return '{}.{}{}'.format(root, config.name, ext)
+
+    def _start_worker(self, index):
+        config = self.inputs[index]._replace(channels=self.buffers[index].channels)
+        meter_kwargs = dict(self.meter_kwargs, device_cache=self._device_cache(config))
+        self.buffers[index].settle()
+        worker = self.context.Process(target=_input_worker,
+                                      args=(config, meter_kwargs, self.buffers[index],
+                                            self.stop_flag, self.rate),
+                                      name='input-{}'.format(config.name),
+                                      daemon=True)
+        worker.start()
+        self.workers[index] = worker
+
+    def start(self):
+        self.stop_flag.value = 0
+        for index in range(len(self.inputs)):
+            self._start_worker(index)
+
+    def refresh(self):
+        """
+        Restart the workers that exited unexpectedly
+        :return: number of workers restarted
+        """
+        restarted = 0
+        for index, worker in enumerate(self.workers):
+            if worker is not None and not worker.is_alive():
+                worker.join()
+                print("restarting input {}, exit code {}".format(self.inputs[index].name,
+                                                                 worker.exitcode))
+                self._start_worker(index)
+                restarted += 1
+        self.restarts += restarted
+        return restarted
+
+    def read(self):
+        """
+        :return: list with the latest LevelFrame of every input, in config order
+        """
+        return [frames.read() for frames in self.buffers]
+
+    def stop(self, timeout=2.0):
+        self.stop_flag.value = 1
+        for worker in self.workers:
+            if worker is None:
+                continue
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers = [None] * len(self.inputs)
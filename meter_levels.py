@@ -0,0 +1,290 @@
+"""
+ Level math for the Streaming Meter
+ Requirements: python-numpy
+ Works directly on interleaved paInt16 buffers (bytes, bytearray, memoryview, array.array)
+ without copying the audio.
+"""
+
+from collections import deque
+import numpy as np
+
+FULL_SCALE = 32767  # paInt16 full scale, matches the original audioop based math
+SILENCE_FLOOR = 1e-40  # added before the log10 so digital silence does not blow up
+
+
+def pcm_view(data, channels):
+    """
+    Zero-copy view of an interleaved int16 buffer as a (frames, channels) array
+    :param data: any object supporting the buffer protocol holding paInt16 samples
+    :param channels: number of interleaved channels
+    :return: numpy.ndarray of dtype int16 and shape (frames, channels)
+    """
+    samples = np.frombuffer(data, dtype=np.int16)
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels)
+
+
+def make_scratch(frames, channels):
+    """
+    Preallocate the float buffer channel_levels() uses for the RMS so it can be reused per call
+    :param frames: number of frames per analyzed block
+    :param channels: number of interleaved channels
+    :return: numpy.ndarray of dtype float64 and shape (frames, channels)
+    """
+    # float64 like the sum of squares, einsum would otherwise upcast through a block sized
+    # temporary on every call
+    return np.empty((frames, channels), dtype=np.float64)
+
+
+def channel_levels(data, channels, scratch=None):
+    """
+    Calculate the peak, RMS and peak dBFS of every channel in a single pass over the buffer
+    :param data: interleaved paInt16 buffer
+    :param channels: number of interleaved channels
+    :param scratch: optional buffer from make_scratch(), avoids allocating a float copy of the
+                    audio on every call when it matches the block size
+    :return: (peak, rms, dbfs) numpy arrays with one entry per channel. peak and rms are
+             normalized to 0.0 - 1.0 of full scale
+    """
+    pcm = pcm_view(data, channels)
+    if not len(pcm):
+        silence = np.zeros(channels)
+        return silence, silence, to_dbfs(silence)
+
+    peak = _peak(pcm.max(axis=0), pcm.min(axis=0))
+    # einsum sums the squares per channel without building a squared copy of the buffer
+    if scratch is not None and scratch.shape == pcm.shape:
+        samples = scratch
+        np.copyto(samples, pcm, casting='unsafe')
+    else:
+        samples = pcm.astype(np.float64)
+    rms = np.sqrt(np.einsum('ij,ij->j', samples, samples) / len(pcm)) / FULL_SCALE
+    dbfs = to_dbfs(peak)
+
+    return peak, rms, dbfs
+
+
+def clipped(data, channels):
+    """
+    :param data: interleaved paInt16 buffer
+    :param channels: number of interleaved channels
+    :return: numpy bool array, True for every channel that reaches full scale in data
+    """
+    pcm = pcm_view(data, channels)
+    if not len(pcm):
+        return np.zeros(channels, dtype=bool)
+    return _peak(pcm.max(axis=0), pcm.min(axis=0)) >= 1.0
+
+
+def window_levels(data, channels, window_frames):
+    """
+    Calculate the levels of many consecutive windows at once, channel_levels() for every
+    window_frames frames of the buffer. A trailing partial window is ignored
+    :param data: interleaved paInt16 buffer
+    :param channels: number of interleaved channels
+    :param window_frames: frames per window
+    :return: (peak, rms, dbfs, clipped) numpy arrays of shape (windows, channels). clipped
+             counts the samples at full scale in each window
+    """
+    pcm = pcm_view(data, channels)
+    windows = len(pcm) // window_frames
+    pcm = pcm[:windows * window_frames].reshape(windows, window_frames, channels)
+
+    high = pcm.max(axis=1)
+    low = pcm.min(axis=1)
+    peak = _peak(high, low)
+    samples = pcm.astype(np.float64)
+    rms = np.sqrt(np.einsum('wij,wij->wj', samples, samples) / window_frames) / FULL_SCALE
+    # only windows that reach full scale need the samples counted
+    clipped = np.zeros((windows, channels), dtype=np.int64)
+    hot = np.nonzero(((high >= FULL_SCALE) | (low <= -FULL_SCALE)).any(axis=1))[0]
+    if len(hot):
+        clipped[hot] = ((pcm[hot] >= FULL_SCALE) | (pcm[hot] <= -FULL_SCALE)).sum(axis=1)
+
+    return peak, rms, to_dbfs(peak), clipped
+
+
+class SlidingLevels:
+    """
+    Levels over a window that slides hop_frames at a time. Every hop is reduced once to its
+    peak and integer sum of squares, the window levels are then updated from those with a
+    monotonic queue for the running max and a running sum for the RMS, so a hop costs O(hop)
+    however long the window is. Audio can be fed in blocks of any size, frames that do not
+    fill a hop are kept for the next call
+    """
+
+    def __init__(self, channels, window_frames, hop_frames):
+        """
+        :param channels: number of interleaved channels
+        :param window_frames: frames the levels are calculated over, rounded to whole hops
+        :param hop_frames: frames the window advances per update
+        """
+        self.channels = channels
+        self.hop_frames = max(1, int(hop_frames))
+        self.window_hops = max(1, int(round(window_frames / self.hop_frames)))
+        self.window_frames = self.window_hops * self.hop_frames
+        self.hops = 0  # hops metered since the start
+        self._pending = np.zeros((self.hop_frames, channels), dtype=np.int16)
+        self._pending_frames = 0
+        # sums of squares of the hops in the window, exact in int64 so the running sum can
+        # subtract the hop leaving the window without drifting
+        self._hop_squares = np.zeros((self.window_hops, channels), dtype=np.int64)
+        self._square_sum = np.zeros(channels, dtype=np.int64)
+        # per channel (hop, peak) pairs with falling peaks, the front is the window max
+        self._peak_queues = [deque() for _ in range(channels)]
+        self.peak, self.rms, self.dbfs = channel_levels(b'', channels)
+
+    def process(self, data):
+        """
+        Meter the next block of audio and update peak, rms and dbfs if a hop was completed
+        :param data: interleaved paInt16 buffer
+        :return: numpy array with the number of completed hops that reached full scale, per
+                 channel
+        """
+        pcm = pcm_view(data, self.channels)
+        clipped = np.zeros(self.channels, dtype=np.int64)
+        start = 0
+        hop = self.hop_frames
+        if self._pending_frames:
+            take = min(hop - self._pending_frames, len(pcm))
+            self._pending[self._pending_frames:self._pending_frames + take] = pcm[:take]
+            self._pending_frames += take
+            start = take
+            if self._pending_frames == hop:
+                clipped += self._add_hops(self._pending[None])
+                self._pending_frames = 0
+
+        whole = (len(pcm) - start) // hop
+        if whole:
+            clipped += self._add_hops(pcm[start:start + whole * hop].reshape(whole, hop,
+                                                                              self.channels))
+            start += whole * hop
+
+        rest = len(pcm) - start
+        if rest:
+            self._pending[:rest] = pcm[start:]
+            self._pending_frames = rest
+        return clipped
+
+    def _add_hops(self, hops):
+        """
+        :param hops: int16 array of shape (hops, hop_frames, channels)
+        :return: hops that reached full scale, per channel
+        """
+        high = hops.max(axis=1)
+        low = hops.min(axis=1)
+        peaks = _peak(high, low).tolist()
+        squares = np.einsum('hij,hij->hj', hops, hops, dtype=np.int64)
+
+        for index in range(len(hops)):
+            slot = self.hops % self.window_hops
+            self._square_sum += squares[index] - self._hop_squares[slot]
+            self._hop_squares[slot] = squares[index]
+            oldest = self.hops - self.window_hops
+            for channel, queue in enumerate(self._peak_queues):
+                peak = peaks[index][channel]
+                while queue and queue[-1][1] <= peak:
+                    queue.pop()
+                queue.append((self.hops, peak))
+                if queue[0][0] <= oldest:
+                    queue.popleft()
+            self.hops += 1
+
+        frames = min(self.hops, self.window_hops) * self.hop_frames
+        self.peak = np.array([queue[0][1] for queue in self._peak_queues])
+        self.rms = np.sqrt(self._square_sum / frames) / FULL_SCALE
+        self.dbfs = to_dbfs(self.peak)
+        return ((high >= FULL_SCALE) | (low <= -FULL_SCALE)).sum(axis=0)
+
+
+class Spectrum:
+    """
+    Fractional octave band spectrum (1/3 octave by default) of a block of audio. The block is
+    cut into half overlapping segments which are windowed and transformed with one batched
+    real FFT, the band powers are then summed from the averaged bin powers with a cumulative
+    sum. The window, the segment layout and the bin range of every band are computed once, a
+    block only costs the FFT and a few vectorized passes over the bins
+    """
+
+    def __init__(self, sample_rate, channels, block_frames, fft_frames=4096,
+                 bands_per_octave=3, low=25.0, high=20000.0):
+        """
+        :param sample_rate: sample rate of the audio
+        :param channels: number of interleaved channels, they are mixed to mono
+        :param block_frames: frames per analyzed block, e.g. the VUMeter capture buffer
+        :param fft_frames: frames per FFT segment, sets the frequency resolution
+        :param bands_per_octave: 3 for 1/3 octave bands
+        :param low: lowest band centre in Hz
+        :param high: highest band centre in Hz
+        """
+        self.channels = channels
+        self.fft_frames = fft_frames = min(fft_frames, block_frames)
+        hop = fft_frames // 2
+        self.segments = max(1, (block_frames - fft_frames) // hop + 1)
+        # (segment, frame) -> index into the mono block, one fancy-index gathers all segments
+        self._segment_index = np.arange(self.segments)[:, None] * hop + np.arange(fft_frames)
+        # float64 throughout, in float32 the cumulative sum cancels bands ~70 dB below the
+        # loudest one
+        self.window = np.hanning(fft_frames)
+        # a full scale sine reads 0 dB in its band, rfft only returns the positive frequencies
+        self._scale = 4.0 / (fft_frames * np.dot(self.window, self.window) * self.segments *
+                             FULL_SCALE ** 2)
+
+        # band centres on the base 10 series of IEC 61260, 1 kHz is always a centre
+        per_decade = 10 * bands_per_octave / 3.0
+        first = int(np.ceil(per_decade * np.log10(low / 1000.0) - 1e-6))
+        last = int(np.floor(per_decade * np.log10(min(high, sample_rate / 2.2) / 1000.0) + 1e-6))
+        steps = np.arange(first, last + 1)
+        self.centers = 1000.0 * 10 ** (0.3 * steps / bands_per_octave)
+        half_band = 10 ** (0.15 / bands_per_octave)
+        bin_width = sample_rate / fft_frames
+        starts = np.ceil(self.centers / half_band / bin_width).astype(np.int64)
+        stops = np.ceil(self.centers * half_band / bin_width).astype(np.int64)
+        # low bands narrower than a bin read the bin nearest their centre
+        narrow = stops <= starts
+        starts[narrow] = np.round(self.centers[narrow] / bin_width).astype(np.int64)
+        stops[narrow] = starts[narrow] + 1
+        self._starts = starts
+        self._stops = np.minimum(stops, fft_frames // 2 + 1)
+        self.levels = np.full(len(self.centers), to_dbfs(0.0))
+
+    def process(self, data):
+        """
+        Calculate the band levels of a block, the block must be in time order
+        :param data: interleaved paInt16 buffer of block_frames frames
+        :return: numpy array with the level of every band in dBFS, also kept in self.levels
+        """
+        pcm = pcm_view(data, self.channels)
+        if len(pcm) < self._segment_index[-1, -1] + 1:
+            return self.levels
+        mono = pcm[:, 0] if self.channels == 1 else pcm.mean(axis=1)
+        segments = mono[self._segment_index] * self.window
+        bins = np.fft.rfft(segments, axis=1)
+        power = np.einsum('ij,ij->j', bins.real, bins.real) + \
+            np.einsum('ij,ij->j', bins.imag, bins.imag)
+        cumulative = np.concatenate(([0.0], np.cumsum(power)))
+        band_power = (cumulative[self._stops] - cumulative[self._starts]) * self._scale
+        self.levels = 10 * np.log10(band_power + SILENCE_FLOOR)
+        return self.levels
+
+
+def _peak(high, low):
+    # abs() of -32768 overflows int16 so take the max and min separately
+    return np.maximum(high.astype(np.float64), -low.astype(np.float64)) / FULL_SCALE
+
+
+def to_dbfs(amplitude):
+    """
+    :param amplitude: level normalized to 0.0 - 1.0 of full scale, scalar or numpy array
+    :return: level in dBFS
+    """
+    return 20 * np.log10(amplitude + SILENCE_FLOOR)
+
+
+def dbfs_to_bars(dbfs):
+    """
+    Convert a peak dBFS value into the number of lit meter segments, 41 segments = 0dBFS
+    :param dbfs: peak level in dBFS
+    :return: int
+    """
+    return int(41 + dbfs)
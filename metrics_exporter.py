@@ -0,0 +1,181 @@
+"""
+ Metrics exporter for the Streaming Meter
+ Serves the latest published metrics snapshot over HTTP, /metrics in the Prometheus text
+ format and /metrics.json as JSON. Requests are answered from the snapshot only, they never
+ touch the audio or render path.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsExporter:
+    """ Small HTTP server publishing meter metrics for central scraping """
+
+    def __init__(self, host='0.0.0.0', port=9108):
+        self.host = host
+        self.port = port
+        self.snapshot = {}
+        self.server = None
+        self._thread = None
+
+    def publish(self, snapshot):
+        """
+        Replace the served snapshot, the dict must not be modified after it was published
+        :param snapshot: dict as built by MeterRuntime.metrics_snapshot()
+        :return: None
+        """
+        self.snapshot = snapshot
+
+    def start(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                snapshot = exporter.snapshot
+                path = self.path.split('?', 1)[0]
+                if path in ('/', '/metrics'):
+                    body = format_prometheus(snapshot).encode('utf8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(snapshot).encode('utf8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes would flood the console
+
+        self.server = _ThreadingHTTPServer((self.host, self.port), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, name='MetricsExporter',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def _number(value):
+    # Icecast reports everything as text
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _labels(**labels):
+    return ','.join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for key, value in labels.items())
+
+
+def format_prometheus(snapshot):
+    """
+    Format a metrics snapshot in the Prometheus text exposition format
+    :param snapshot: dict as built by MeterRuntime.metrics_snapshot()
+    :return: str
+    """
+    metrics = {}  # name -> (type, help, [(labels, value)])
+
+    def add(name, kind, help_text, value, labels=''):
+        if value is None:
+            return
+        metrics.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+
+    for channel in snapshot.get('channels', []):
+        labels = _labels(channel=channel['channel'])
+        add('vumeter_peak_dbfs', 'gauge', 'Sample peak of the last metered block in dBFS',
+            channel['peak_dbfs'], labels)
+        add('vumeter_rms_dbfs', 'gauge', 'RMS of the last metered block in dBFS',
+            channel['rms_dbfs'], labels)
+        add('vumeter_clips_total', 'counter', 'Metered blocks that reached full scale',
+            channel['clips'], labels)
+        add('vumeter_meter_level_db', 'gauge', 'Reading of the selected meter mode in dB',
+            channel.get('meter_db'), _labels(channel=channel['channel'],
+                                             mode=snapshot.get('meter_mode')))
+    for window, value in sorted(snapshot.get('loudness', {}).items()):
+        add('vumeter_loudness_lufs', 'gauge', 'ITU-R BS.1770 loudness',
+            value, _labels(window=window))
+    for meter_input in snapshot.get('inputs', []):
+        for channel in meter_input['channels']:
+            labels = _labels(input=meter_input['input'], channel=channel['channel'])
+            add('vumeter_input_peak_dbfs', 'gauge', 'Sample peak of an input in dBFS',
+                channel['peak_dbfs'], labels)
+            add('vumeter_input_level_db', 'gauge', 'Reading of the selected meter mode per input',
+                channel['meter_db'], _labels(input=meter_input['input'],
+                                             channel=channel['channel'],
+                                             mode=snapshot.get('meter_mode')))
+            add('vumeter_input_clips_total', 'counter', 'Metered blocks of an input at full scale',
+                channel['clips'], labels)
+        labels = _labels(input=meter_input['input'])
+        add('vumeter_input_overflows_total', 'counter', 'Input overflows of an input device',
+            meter_input['overflows'], labels)
+        add('vumeter_input_recoveries_total', 'counter', 'Stream reopens of an input device',
+            meter_input['recoveries'], labels)
+        add('vumeter_input_frame_age_seconds', 'gauge', 'Age of the latest level frame',
+            meter_input['age'], labels)
+    for side, value in sorted(snapshot.get('peak_hold', {}).items()):
+        add('vumeter_peak_hold_segments', 'gauge', 'Peak hold position in meter segments',
+            value, _labels(side=side))
+
+    for mount in snapshot.get('mounts', []):
+        labels = _labels(server=mount['server'], mount=mount['mount'])
+        add('icecast_listeners', 'gauge', 'Current listeners of the mount',
+            _number(mount['listeners']), labels)
+        add('icecast_listener_peak', 'gauge', 'Peak listeners of the mount',
+            _number(mount['listener_peak']), labels)
+        add('icecast_slow_listeners', 'gauge', 'Slow listeners of the mount',
+            _number(mount['slow_listeners']), labels)
+        add('icecast_poll_errors', 'gauge', 'Consecutive failed stats polls',
+            mount['poll_errors'], labels)
+
+    probes = snapshot.get('probes', {})
+    for stage, summary in probes.get('stages', {}).items():
+        for key, quantile in (('p50', '0.5'), ('p99', '0.99')):
+            add('vumeter_stage_seconds', 'gauge', 'Duration of a main loop stage',
+                summary[key], _labels(stage=stage, quantile=quantile))
+        add('vumeter_stage_max_seconds', 'gauge', 'Slowest run of a main loop stage',
+            summary['max'], _labels(stage=stage))
+        add('vumeter_stage_runs_total', 'counter', 'Runs of a main loop stage',
+            summary['count'], _labels(stage=stage))
+    for event, value in sorted(probes.get('counters', {}).items()):
+        add('vumeter_events_total', 'counter', 'Overruns, dropped frames and restarts',
+            value, _labels(event=event))
+
+    for component, rate in sorted(snapshot.get('rates', {}).items()):
+        add('vumeter_rate_hz', 'gauge', 'Current run rate of a paced component',
+            rate, _labels(component=component))
+    add('vumeter_frame_load', 'gauge', 'Average share of the frame budget in use',
+        snapshot.get('frame_load'))
+    add('vumeter_frames_total', 'counter', 'Frames rendered', snapshot.get('frames'))
+    add('vumeter_frame_seconds', 'gauge', 'Time spent rendering the last frame',
+        snapshot.get('frame_seconds'))
+    add('vumeter_player_running', 'gauge', 'Whether the stream player is running',
+        snapshot.get('player_running'))
+    add('vumeter_snapshot_timestamp_seconds', 'gauge', 'When this snapshot was taken',
+        snapshot.get('time'))
+
+    lines = []
+    for name, (kind, help_text, samples) in metrics.items():
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        for labels, value in samples:
+            if labels:
+                lines.append('{}{{{}}} {}'.format(name, labels, float(value)))
+            else:
+                lines.append('{} {}'.format(name, float(value)))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,171 @@
+"""
+ Frame pacing for the Streaming Meter
+ Every periodic part of the meter declares the rate it wants to run at and the lowest rate it
+ can live with. The scheduler hands out the deadlines, so the tasks sleep between them instead
+ of spinning, and when the frames take longer than their budget it lowers the rates one step at
+ a time, the least important component first, and raises them again once there is room.
+"""
+
+from collections import OrderedDict
+
+
+class Cadence:
+    """ Target rate and next deadline of one component """
+    STEP = 1.5  # rate factor of one degrade or recover step
+
+    def __init__(self, name, rate, min_rate=None, shed=0):
+        """
+        :param name: component name
+        :param rate: wanted runs per second
+        :param min_rate: lowest runs per second under load, rate by default (never degraded)
+        :param shed: components with a lower value are degraded first
+        """
+        self.name = name
+        self.shed = shed
+        self.max_rate = float(rate)
+        self.min_rate = float(min(min_rate or rate, rate))
+        self.rate = self.max_rate
+        self.deadline = None  # None runs on the next chance
+
+    @property
+    def period(self):
+        return 1.0 / self.rate
+
+    @property
+    def degraded(self):
+        return self.rate < self.max_rate
+
+    def due(self, now):
+        """
+        :param now: current time of the scheduler clock
+        :return: True when the component should run
+        """
+        return self.deadline is None or now >= self.deadline
+
+    def delay(self, now):
+        """
+        :param now: current time of the scheduler clock
+        :return: seconds until the next deadline, 0 when due
+        """
+        if self.deadline is None:
+            return 0.0
+        return max(0.0, self.deadline - now)
+
+    def ran(self, now):
+        """
+        Move the deadline one period on after a run. A run ahead of its deadline, e.g. after
+        invalidate(), and a run that came in late both restart the count from now instead of
+        running the missed periods back to back
+        :param now: current time of the scheduler clock
+        :return: number of deadlines that passed during the run, 0 when it finished in time
+        """
+        if self.deadline is None or now < self.deadline:
+            self.deadline = now
+        self.deadline += self.period
+        late = now - self.deadline
+        if late < 0:
+            return 0
+        self.deadline = now + self.period
+        return int(late / self.period) + 1
+
+    def invalidate(self):
+        """ Run on the next chance, e.g. after the display was cleared """
+        self.deadline = None
+
+    def step_down(self):
+        self.rate = max(self.min_rate, self.rate / self.STEP)
+
+    def step_up(self):
+        self.rate = min(self.max_rate, self.rate * self.STEP)
+
+
+class FrameScheduler:
+    """ Cadences of the meter and the adaptive quality control of the frame loop """
+    HIGH_LOAD = 0.8  # share of the frame budget that starts degrading
+    # below HIGH_LOAD / Cadence.STEP, so the load right after degrading the frame rate does
+    # not recover it again
+    LOW_LOAD = 0.4  # share of the frame budget that allows recovering
+    SETTLE_SECONDS = 1.0  # wait after a change before degrading further
+    RECOVER_SECONDS = 5.0  # seconds of low load before recovering a step
+    SMOOTHING = 0.1  # weight of the newest frame in the load average
+
+    def __init__(self, frame_cadence='meter'):
+        """
+        :param frame_cadence: name of the cadence that paces the frames and sets the budget
+        """
+        self.cadences = OrderedDict()
+        self.frame_cadence = frame_cadence
+        self.load = 0.0
+        self.changed = None  # time of the last degrade or recover step
+        self.calm = None  # since when the load is below LOW_LOAD
+        self.degrades = 0
+        self.recovers = 0
+
+    def add(self, name, rate, min_rate=None, shed=None):
+        """
+        Declare a component
+        :param name: component name
+        :param rate: wanted runs per second
+        :param min_rate: lowest runs per second under load, rate by default (never degraded)
+        :param shed: order in which components are degraded, lowest first. Components without
+                     it are degraded in the order they were added
+        :return: Cadence
+        """
+        cadence = Cadence(name, rate, min_rate,
+                          shed=shed if shed is not None else len(self.cadences))
+        self.cadences[name] = cadence
+        return cadence
+
+    def __getitem__(self, name):
+        return self.cadences[name]
+
+    def due(self, name, now):
+        return self.cadences[name].due(now)
+
+    def ran(self, name, now):
+        return self.cadences[name].ran(now)
+
+    def delay(self, name, now):
+        return self.cadences[name].delay(now)
+
+    def rates(self):
+        """
+        :return: dict of the current rate of every component
+        """
+        return {name: cadence.rate for name, cadence in self.cadences.items()}
+
+    def _shed_order(self):
+        return sorted(self.cadences.values(), key=lambda cadence: cadence.shed)
+
+    def adapt(self, busy_seconds, now):
+        """
+        Feed the time one frame kept the loop busy and change the rates when needed
+        :param busy_seconds: duration of the frame work plus how late the frame started, without
+                             the sleep
+        :param now: current time of the scheduler clock
+        :return: 'degrade', 'recover' or None when nothing changed
+        """
+        budget = self.cadences[self.frame_cadence].period
+        self.load += (busy_seconds / budget - self.load) * self.SMOOTHING
+        if self.changed is None:
+            self.changed = now
+        if self.load >= self.LOW_LOAD:
+            self.calm = None
+        elif self.calm is None:
+            self.calm = now
+
+        if self.load > self.HIGH_LOAD and now - self.changed >= self.SETTLE_SECONDS:
+            for cadence in self._shed_order():
+                if cadence.rate > cadence.min_rate:
+                    cadence.step_down()
+                    self.changed = now
+                    self.degrades += 1
+                    return 'degrade'
+        elif self.calm is not None and now - max(self.calm, self.changed) >= self.RECOVER_SECONDS:
+            for cadence in reversed(self._shed_order()):
+                if cadence.degraded:
+                    cadence.step_up()
+                    self.changed = now
+                    self.recovers += 1
+                    return 'recover'
+        return None
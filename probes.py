@@ -0,0 +1,156 @@
+"""
+ Timing probes for the Streaming Meter
+ Every probed stage keeps its durations in a fixed size histogram, so the probes cost a clock
+ read and a few integer operations per call and never grow however long the meter runs.
+ Counters for events like overruns and restarts sit next to them.
+"""
+
+import math
+import time
+from collections import OrderedDict
+
+
+class Histogram:
+    """ Latency histogram with log spaced buckets, 4 per octave from 10 us to about 10 s """
+    MIN_SECONDS = 1e-5
+    BUCKETS_PER_OCTAVE = 4
+    BUCKETS = 80  # 20 octaves, everything slower goes into the last bucket
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, seconds):
+        """
+        :param seconds: duration of one call
+        :return: None
+        """
+        if seconds > self.MIN_SECONDS:
+            bucket = min(int(math.log2(seconds / self.MIN_SECONDS) * self.BUCKETS_PER_OCTAVE),
+                         self.BUCKETS - 1)
+        else:
+            bucket = 0
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent):
+        """
+        :param percent: 0 - 100
+        :return: upper bound of the bucket holding the percentile in seconds, None when empty
+        """
+        if not self.count:
+            return None
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count:
+                upper = self.MIN_SECONDS * 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE)
+                return min(upper, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def reset(self):
+        self.__init__()
+
+
+class Probes:
+    """ Named histograms and counters of one process """
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self.histograms = OrderedDict()
+        self.counters = OrderedDict()
+        self.started = self.clock()
+
+    def histogram(self, name):
+        """
+        :param name: stage name
+        :return: the Histogram of the stage, created on first use
+        """
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, started):
+        """
+        Record the time since started for a stage:
+            started = probes.clock()
+            ...
+            probes.record('render.update', started)
+        :param name: stage name
+        :param started: value of clock() when the stage started
+        :return: the recorded duration in seconds
+        """
+        elapsed = self.clock() - started
+        self.histogram(name).add(elapsed)
+        return elapsed
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        self.histograms.clear()
+        self.counters.clear()
+        self.started = self.clock()
+
+    def snapshot(self, extra_histograms=None):
+        """
+        :param extra_histograms: optional dict of name -> Histogram kept elsewhere
+        :return: dict with the summary of every histogram in seconds and every counter
+        """
+        histograms = OrderedDict(self.histograms)
+        histograms.update(extra_histograms or {})
+        stages = OrderedDict()
+        for name, histogram in histograms.items():
+            stages[name] = {'count': histogram.count,
+                            'mean': histogram.mean,
+                            'p50': histogram.percentile(50),
+                            'p99': histogram.percentile(99),
+                            'max': histogram.max}
+        return {'uptime': self.clock() - self.started,
+                'stages': stages,
+                'counters': dict(self.counters)}
+
+    def table_rows(self, extra_histograms=None):
+        """
+        The probes as a small table, for the debug overlay and the dump
+        :param extra_histograms: optional dict of name -> Histogram kept elsewhere
+        :return: list of rows, each a list of str cells. The counters are the last row
+        """
+        snapshot = self.snapshot(extra_histograms)
+        rows = [['stage ms', 'n', 'p50', 'p99', 'max']]
+        for name, stage in snapshot['stages'].items():
+            if not stage['count']:
+                continue
+            rows.append([name, str(stage['count'])] +
+                        ['{:.2f}'.format(stage[key] * 1000) for key in ('p50', 'p99', 'max')])
+        if snapshot['counters']:
+            rows.append(['  '.join('{} {}'.format(name, value)
+                                   for name, value in snapshot['counters'].items())])
+        return rows
+
+    def format_lines(self, extra_histograms=None):
+        """
+        :param extra_histograms: optional dict of name -> Histogram kept elsewhere
+        :return: table_rows() as fixed width lines of text
+        """
+        lines = []
+        for row in self.table_rows(extra_histograms):
+            if len(row) == 1:
+                lines.append(row[0])
+            else:
+                lines.append('{:<22}'.format(row[0]) + ''.join('{:>9}'.format(cell)
+                                                               for cell in row[1:]))
+        return lines
@@ -0,0 +1,721 @@
+"""
+ pygame display backend for the Streaming Meter
+ Requirements: python-pygame
+ Only imported when the pygame backend is selected, see display.create_renderer()
+"""
+
+import pygame
+from collections import OrderedDict
+import numpy as np
+from pygame.locals import QUIT, KEYUP, K_ESCAPE, K_LEFT, K_RIGHT, K_TAB, K_d
+from display import ColorPicker, Renderer, NullMountpoint
+
+
+def init():
+    pygame.init()
+    pygame.mixer.quit()  # stops unwanted audio output on some computers
+
+
+class Window:
+    """ Main window class """
+
+    def __init__(self, window_width, window_height, window_frame=pygame.NOFRAME,
+                 window_caption="VU Meter", bg_color=(0, 0, 0), font=None):
+        self.width = window_width
+        self.height = window_height
+        self.caption = window_caption
+        self.bg_color = bg_color
+        self.font = font if font is not None else pygame.font.Font('freesansbold.ttf', 12)
+
+        self.screen = pygame.display.set_mode((window_width, window_height), window_frame)
+        pygame.display.set_caption(window_caption)
+        self.screen.fill(self.bg_color)
+
+    @staticmethod
+    def update(rects=None):
+        """
+            update the pygame window
+            :param rects: optional list of dirty rects, only these areas are pushed to the display
+            :return: None
+        """
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+
+
+class dbWindow:
+    """ dB Window class for displaying the dB levels on the VU meter"""
+    SEGMENTS = 41  # 0dBFS lights all 41 segments
+    SEGMENT_STEP = 12  # x distance between the start of each segment
+    SEGMENT_WIDTH = 30
+    SEGMENT_HEIGHT = 12
+    CHANNEL_YPOS = (10, 69)  # left, right
+
+    def __init__(self, screen, window_width, window_height, bg_color=(0, 0, 0), font=None):
+        self.screen = screen
+        self.width = window_width
+        self.height = window_height
+        self.bg_color = bg_color
+        self.font = font if font is not None else pygame.font.Font('freesansbold.ttf', 12)
+        self.surf = pygame.Surface((self.width, self.height))
+        self.metering = {'green': 30,  # -10
+                         'yellow': 36,  # -4
+                         'red': 39,  # -1
+                        }
+
+        # the scale never changes and the lit bars only ever grow or shrink from the left, so
+        # both are rendered once here and every frame is a couple of clipped blits
+        self._render_scale()
+        self._render_bars()
+        self.shown_levels = [0] * len(self.CHANNEL_YPOS)
+        self.scale_drawn = False
+
+    def _segment_color(self, segment):
+        if segment < self.metering['green']:
+            return ColorPicker.GREEN
+        elif self.metering['green'] <= segment < self.metering['yellow']:
+            return ColorPicker.YELLOW
+        elif self.metering['yellow'] <= segment < self.metering['red']:
+            return ColorPicker.RED
+        return ColorPicker.WHITE
+
+    def _render_scale(self):
+        """
+        Render the static dB scale into self.surf, this is the background of the meter
+        :return: None
+        """
+        self.surf.fill(self.bg_color)
+
+        # Write the scale and draw in the lines
+        xpos = 0
+        xpos_step_size = 47
+        for dB in range(-40, 1, 4):
+
+            # dB numbers on the scale
+            # --  0  --
+            #    ...
+            # -- -20 --
+            #    ...
+            # -- -40 --
+            # draw the numbers
+            str_number = str(dB)
+            text = self.font.render(str_number, 1, (255, 255, 255))
+            self.surf.blit(text, (xpos, 40))
+
+            # draw the lines before and after the numbers
+            pygame.draw.line(self.surf, (255, 255, 255), (5 + xpos, 25), (5 + xpos, 35), 1)
+            pygame.draw.line(self.surf, (255, 255, 255), (5 + xpos, 55), (5 + xpos, 65), 1)
+            xpos += xpos_step_size
+
+    def _render_bars(self):
+        """
+        Render a fully lit channel strip plus the trailing end of a segment in each color.
+        Each segment is wider than the step between segments so the next segment paints over
+        the tail of the previous one, the tail is only visible on the last lit segment.
+        Green = -40 to -20
+        Yellow = -10 to -5
+        Red = -5 to 0
+        Clipping = +1 +
+        :return: None
+        """
+        self.tail_width = self.SEGMENT_WIDTH - self.SEGMENT_STEP
+        self.bar_strip = pygame.Surface((self.SEGMENTS * self.SEGMENT_STEP + self.tail_width,
+                                         self.SEGMENT_HEIGHT))
+        self.bar_strip.fill(self.bg_color)
+        for i in range(0, self.SEGMENTS):
+            pygame.draw.rect(self.bar_strip, self._segment_color(i),
+                             (i * self.SEGMENT_STEP, 0, self.SEGMENT_WIDTH, self.SEGMENT_HEIGHT))
+
+        self.bar_tails = {}
+        for color in (ColorPicker.GREEN, ColorPicker.YELLOW, ColorPicker.RED, ColorPicker.WHITE):
+            tail = pygame.Surface((self.tail_width, self.SEGMENT_HEIGHT))
+            tail.fill(color)
+            self.bar_tails[color] = tail
+
+    def _bar_extent(self, level):
+        # segment i covers x = i*12-1 to i*12+29, the first pixel is off screen
+        return level * self.SEGMENT_STEP - 1 + self.tail_width
+
+    def draw(self, LevelL=0, LevelR=0):
+        """
+        Draw the db meter, only the parts of the channel bars that changed are redrawn
+        :param LevelL: Left channel Level
+        :param LevelR: Right Channel Level
+        :return: list of the dirty rects on self.screen
+        """
+        dirty_rects = []
+        if not self.scale_drawn:
+            self.screen.blit(self.surf, (0, 0))
+            dirty_rects.append(self.surf.get_rect())
+            self.shown_levels = [0] * len(self.CHANNEL_YPOS)
+            self.scale_drawn = True
+
+        for channel, level in enumerate((LevelL, LevelR)):
+            level = min(max(int(level), 0), self.SEGMENTS)
+            shown = self.shown_levels[channel]
+            if level == shown:
+                continue
+
+            ypos = self.CHANNEL_YPOS[channel]
+            rect = pygame.Rect(0, ypos, self._bar_extent(max(level, shown)), self.SEGMENT_HEIGHT)
+            rect = rect.clip(self.surf.get_rect())
+            self.screen.blit(self.surf, rect, area=rect)  # restore the background
+            if level:
+                body_width = level * self.SEGMENT_STEP - 1
+                self.screen.blit(self.bar_strip, (0, ypos),
+                                 area=(1, 0, body_width, self.SEGMENT_HEIGHT))
+                self.screen.blit(self.bar_tails[self._segment_color(level - 1)],
+                                 (body_width, ypos))
+
+            self.shown_levels[channel] = level
+            dirty_rects.append(rect)
+
+        return dirty_rects
+
+    def invalidate(self):
+        """
+        Force the scale and both channels to be redrawn on the next draw()
+        :return: None
+        """
+        self.scale_drawn = False
+
+
+class SpectrumWindow:
+    """ Band bargraph of the spectrum, shown in place of the dB window """
+    FLOOR_DB = -60.0  # bottom of the scale
+    SEGMENT_DB = 3.0
+    SEGMENTS = 20
+    SEGMENT_STEP = 4  # y distance between the start of each segment
+    SEGMENT_HEIGHT = 3
+    FALL_DB = 1.0  # dB a band falls per frame, so short peaks stay readable
+    YELLOW_DB = -12.0
+    RED_DB = -6.0
+    # octave band labels, ISO nominal frequencies
+    LABELS = ((31.5, '31'), (63, '63'), (125, '125'), (250, '250'), (500, '500'),
+              (1000, '1k'), (2000, '2k'), (4000, '4k'), (8000, '8k'), (16000, '16k'))
+
+    def __init__(self, screen, window_width, window_height, band_centers, bg_color=(0, 0, 0),
+                 font=None):
+        self.screen = screen
+        self.width = window_width
+        self.height = window_height
+        self.bg_color = bg_color
+        self.font = font if font is not None else pygame.font.Font('freesansbold.ttf', 12)
+        self.band_centers = np.asarray(band_centers)
+        self.column_step = self.width // len(self.band_centers)
+        self.column_width = max(1, self.column_step - 4)
+        self.bars_height = self.SEGMENTS * self.SEGMENT_STEP
+        self.surf = pygame.Surface((self.width, self.height))
+
+        # like the dB window the background and a fully lit column are rendered once, every
+        # frame only blits the part of the columns that changed
+        self._render_scale()
+        self._render_column()
+        self.shown_segments = np.zeros(len(self.band_centers), dtype=np.int64)
+        self.display_db = np.full(len(self.band_centers), self.FLOOR_DB)
+        self.scale_drawn = False
+
+    def _render_scale(self):
+        self.surf.fill(self.bg_color)
+        for frequency, label in self.LABELS:
+            band = int(np.argmin(np.abs(np.log(self.band_centers / frequency))))
+            if abs(np.log2(self.band_centers[band] / frequency)) > 0.1:
+                continue  # outside the analyzed range
+            text = self.font.render(label, 1, ColorPicker.WHITE)
+            xpos = band * self.column_step + (self.column_width - text.get_width()) // 2
+            self.surf.blit(text, (max(0, xpos), self.bars_height + 2))
+
+    def _render_column(self):
+        self.column = pygame.Surface((self.column_width, self.bars_height))
+        self.column.fill(self.bg_color)
+        for segment in range(self.SEGMENTS):
+            top_db = self.FLOOR_DB + (segment + 1) * self.SEGMENT_DB
+            if top_db <= self.YELLOW_DB:
+                color = ColorPicker.GREEN
+            elif top_db <= self.RED_DB:
+                color = ColorPicker.YELLOW
+            else:
+                color = ColorPicker.RED
+            ypos = self.bars_height - (segment + 1) * self.SEGMENT_STEP
+            pygame.draw.rect(self.column, color,
+                             (0, ypos, self.column_width, self.SEGMENT_HEIGHT))
+
+    def draw(self, band_levels):
+        """
+        Draw the band bargraph, only the columns whose lit segments changed are redrawn
+        :param band_levels: level of every band in dBFS
+        :return: list of the dirty rects on self.screen
+        """
+        dirty_rects = []
+        if not self.scale_drawn:
+            self.screen.blit(self.surf, (0, 0))
+            dirty_rects.append(self.surf.get_rect())
+            self.shown_segments[:] = 0
+            self.scale_drawn = True
+
+        self.display_db = np.maximum(band_levels, self.display_db - self.FALL_DB)
+        segments = np.clip(((self.display_db - self.FLOOR_DB) / self.SEGMENT_DB).astype(np.int64),
+                           0, self.SEGMENTS)
+        for band in np.nonzero(segments != self.shown_segments)[0].tolist():
+            rect = pygame.Rect(band * self.column_step, 0, self.column_width, self.bars_height)
+            self.screen.blit(self.surf, rect, area=rect)  # restore the background
+            lit = int(segments[band]) * self.SEGMENT_STEP
+            if lit:
+                self.screen.blit(self.column, (rect.x, self.bars_height - lit),
+                                 area=(0, self.bars_height - lit, self.column_width, lit))
+            dirty_rects.append(rect)
+        self.shown_segments = segments
+
+        return dirty_rects
+
+    def invalidate(self):
+        """
+        Force the scale and every band to be redrawn on the next draw()
+        :return: None
+        """
+        self.scale_drawn = False
+
+
+class InputsWindow:
+    """ Levels of several inputs stacked for comparison, shown in place of the dB window """
+    SEGMENTS = 41  # same scale as the dB window, 41 segments = 0dBFS
+    LABEL_WIDTH = 70
+    READOUT_WIDTH = 90
+    FLOOR_DB = -100.0  # readouts below this show as silence
+
+    # the segments take the colors of the dB window
+    _segment_color = dbWindow._segment_color
+
+    def __init__(self, screen, window_width, window_height, names, bg_color=(0, 0, 0),
+                 font=None, text_cache=None):
+        self.screen = screen
+        self.width = window_width
+        self.height = window_height
+        self.names = list(names)
+        self.bg_color = bg_color
+        self.font = font if font is not None else pygame.font.Font('freesansbold.ttf', 12)
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.metering = {'green': 30,  # -10
+                         'yellow': 36,  # -4
+                         'red': 39,  # -1
+                        }
+        self.row_height = self.height // len(self.names)
+        self.bar_height = max(2, (self.row_height - 6) // 2)
+        self.bar_width = self.width - self.LABEL_WIDTH - self.READOUT_WIDTH
+        self.surf = pygame.Surface((self.width, self.height))
+
+        # as in the dB window the labels and a fully lit bar are rendered once, a frame only
+        # redraws the rows whose bars or readout changed
+        self._render_labels()
+        self._render_bar()
+        self.shown_rows = [None] * len(self.names)
+        self.scale_drawn = False
+
+    def _render_labels(self):
+        self.surf.fill(self.bg_color)
+        for row, name in enumerate(self.names):
+            text = self.font.render(name, 1, ColorPicker.WHITE)
+            ypos = row * self.row_height + (self.row_height - text.get_height()) // 2
+            self.surf.blit(text, (2, ypos), area=(0, 0, self.LABEL_WIDTH - 6, text.get_height()))
+
+    def _render_bar(self):
+        self.bar = pygame.Surface((self.bar_width, self.bar_height))
+        self.bar.fill(self.bg_color)
+        step = self.bar_width / self.SEGMENTS
+        for segment in range(self.SEGMENTS):
+            pygame.draw.rect(self.bar, self._segment_color(segment),
+                             (int(segment * step), 0, max(1, int(step) - 1), self.bar_height))
+
+    def _bar_pixels(self, level):
+        segments = min(max(int(level), 0), self.SEGMENTS)
+        return segments * self.bar_width // self.SEGMENTS
+
+    def draw(self, frames):
+        """
+        Draw the inputs, the readout of every input after the first also shows its difference
+        to the first one, e.g. off-air against program
+        :param frames: meter_inputs.LevelFrame of every input, in the order of names
+        :return: list of the dirty rects on self.screen
+        """
+        dirty_rects = []
+        if not self.scale_drawn:
+            self.screen.blit(self.surf, (0, 0))
+            dirty_rects.append(self.surf.get_rect())
+            self.shown_rows = [None] * len(self.names)
+            self.scale_drawn = True
+
+        reference = max(frames[0].meter_db)
+        for row, frame in enumerate(frames):
+            loudest = max(frame.meter_db)
+            if loudest > self.FLOOR_DB:
+                readout = "{:.1f}".format(loudest)
+                if row and reference > self.FLOOR_DB:
+                    readout += "  {:+.1f}".format(loudest - reference)
+            else:
+                readout = "--"
+            shown = (self._bar_pixels(frame.level_left), self._bar_pixels(frame.level_right),
+                     readout)
+            if shown == self.shown_rows[row]:
+                continue
+
+            ypos = row * self.row_height
+            rect = pygame.Rect(self.LABEL_WIDTH, ypos, self.width - self.LABEL_WIDTH,
+                               self.row_height)
+            self.screen.blit(self.surf, rect, area=rect)  # restore the background
+            for channel, pixels in enumerate(shown[:2]):
+                if pixels:
+                    self.screen.blit(self.bar, (self.LABEL_WIDTH,
+                                                ypos + 2 + channel * (self.bar_height + 2)),
+                                     area=(0, 0, pixels, self.bar_height))
+            text = self.text_cache.render(self.font, readout, ColorPicker.WHITE, self.bg_color)
+            self.screen.blit(text, (self.width - self.READOUT_WIDTH + 6,
+                                    ypos + (self.row_height - text.get_height()) // 2))
+            self.shown_rows[row] = shown
+            dirty_rects.append(rect)
+
+        return dirty_rects
+
+    def invalidate(self):
+        """
+        Force the labels and every input to be redrawn on the next draw()
+        :return: None
+        """
+        self.scale_drawn = False
+
+
+class TextCache:
+    """ LRU cache of rendered text surfaces keyed by (text, color, background, font) """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, bg_color=None, antialias=True):
+        """
+        Return the rendered text surface, only calling font.render on a cache miss
+        :param font: pygame font used for the render
+        :param text: string to render
+        :param color: text color
+        :param bg_color: background color, None for a transparent background
+        :param antialias: passed through to font.render
+        :return: pygame.Surface
+        """
+        key = (text, color, bg_color, antialias, font)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color, bg_color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # evict the least recently used surface
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class StatsWindow:
+    """ StatsWindow class used for displaying Icecast2 streaming statistics """
+
+    def __init__(self, screen, name, xpos, ypos, window_width, window_height, text_cache=None,
+                 bg_color=ColorPicker.BLACK, version=""):
+        self.screen = screen
+        self.name = name
+        self.x_position = xpos
+        self.y_position = ypos
+        self.width = window_width
+        self.height = window_height
+        self.surf = pygame.surface.Surface((window_width, window_height))  # size of the whole box
+        self.font = self.font = pygame.font.SysFont("Verdana", 12)
+        self.bg_color = bg_color
+        self.version = version
+        self.surf.fill(self.bg_color)
+        self.surf_copy = self.surf.copy()
+        self.text_cache = text_cache if text_cache is not None else TextCache()
+        self.shown_stats = None  # the stats currently on screen, used to skip identical redraws
+
+    def _render_text(self, text):
+        return self.text_cache.render(self.font, text, ColorPicker.WHITE, self.bg_color)
+
+    def draw(self, ics, page=None, total_listeners=None):
+        """
+        draw the streaming stats window, nothing is drawn if the stats have not changed
+        :param ics: IcecastServer class
+        :param page: optional page label, e.g. "2/3", when paging through several mounts
+        :param total_listeners: optional listener count aggregated over all mounts
+        :return: list of the dirty rects on self.screen
+        """
+        # read the published snapshot once so every field comes from the same poll
+        snapshot = ics.snapshot
+        mount = snapshot.Mount
+        if not mount:
+            # no mount points so lets use a NULL mount point
+            mount = NullMountpoint()
+
+        stats = (mount.ServerDescription,
+                 snapshot.server_start,
+                 mount.StreamStart,
+                 mount.Listeners,
+                 mount.ListenerPeak,
+                 mount.SlowListeners,
+                 ics.mount_point,
+                 page,
+                 total_listeners)
+        if stats == self.shown_stats:
+            return []
+
+        self.surf_copy.blit(self.surf, (0, 0))
+
+        # define text surfaces
+        self.title_surf = self._render_text("{}".format(mount.ServerDescription))
+        self.serverStart_surf = self._render_text("Server Start:  {}".format(
+            snapshot.server_start))
+        self.streamStart_surf = self._render_text("Stream Service Start:  {}".format(
+            mount.StreamStart))
+        self.currentListener_surf = self._render_text("Current Listeners:  {}".format(
+            mount.Listeners))
+        self.peakListener_surf = self._render_text("Peak Listeners:  {}".format(
+            mount.ListenerPeak))
+        self.slowListener_surf = self._render_text("Slow Listeners:  {}".format(
+            mount.SlowListeners))
+        self.version_surf = self._render_text("Version:  {}".format(self.version))
+
+        # define text locations and blit
+        self._text_display_queue(self.title_surf, xpos=0, ypos=0)
+        self._text_display_queue(self.serverStart_surf, xpos=0, ypos=20)
+        self._text_display_queue(self.streamStart_surf, xpos=0, ypos=40)
+        self._text_display_queue(self.currentListener_surf, xpos=0, ypos=70)
+        self._text_display_queue(self.peakListener_surf, xpos=200, ypos=70)
+        self._text_display_queue(self.slowListener_surf, xpos=0, ypos=90)
+        self._text_display_queue(self.version_surf, xpos=0, ypos=120)
+        if page is not None:
+            self._text_display_queue(self._render_text("Mount:  /{}  ({})".format(
+                ics.mount_point, page)), xpos=0, ypos=140)
+        if total_listeners is not None:
+            self._text_display_queue(self._render_text("All Mounts Listeners:  {}".format(
+                total_listeners)), xpos=0, ypos=160)
+
+        self.screen.blit(self.surf_copy, (self.x_position, self.y_position))
+
+        self.shown_stats = stats
+        return [self.surf_copy.get_rect(x=self.x_position, y=self.y_position)]
+
+    def invalidate(self):
+        """
+        Force a redraw on the next draw() even if the stats have not changed
+        :return: None
+        """
+        self.shown_stats = None
+
+    def _text_display_queue(self, _surface, xpos, ypos):
+        """
+        Draw the text surfaces
+        :param _surface: text rect
+        :param xpos:
+        :param ypos:
+        :return: None
+        """
+        _rect = _surface.get_rect(x=xpos, y=ypos)
+        self.surf_copy.blit(_surface, _rect)
+
+
+class DebugOverlay:
+    """ Table drawn over the stats with the timing probes, toggled with the d key """
+    LINE_HEIGHT = 13
+    FIRST_COLUMN_WIDTH = 150
+    COLUMN_WIDTH = 60
+
+    def __init__(self, screen, xpos, ypos, window_width, window_height, bg_color=(20, 20, 40),
+                 text_cache=None):
+        self.screen = screen
+        self.rect = pygame.Rect(xpos, ypos, window_width, window_height)
+        self.bg_color = bg_color
+        self.font = pygame.font.Font('freesansbold.ttf', 10)
+        self.text_cache = text_cache if text_cache is not None else TextCache(max_size=128)
+        self.surf = pygame.Surface(self.rect.size)
+        self.shown_rows = None
+
+    def draw(self, rows, force=False):
+        """
+        :param rows: list of rows of text cells, the first cell is left aligned and the others
+                     right aligned in columns. A row with a single cell spans the whole width
+        :param force: redraw even if the rows did not change, e.g. after the stats were drawn
+                      over the overlay
+        :return: list of the dirty rects on self.screen
+        """
+        if rows == self.shown_rows and not force:
+            return []
+        self.surf.fill(self.bg_color)
+        for index, row in enumerate(rows or []):
+            ypos = 2 + index * self.LINE_HEIGHT
+            if ypos + self.LINE_HEIGHT > self.rect.height:
+                break
+            for column, cell in enumerate(row):
+                text = self.text_cache.render(self.font, cell, ColorPicker.WHITE, self.bg_color)
+                if column == 0:
+                    xpos = 4
+                else:
+                    xpos = 4 + self.FIRST_COLUMN_WIDTH + column * self.COLUMN_WIDTH - \
+                        text.get_width()
+                self.surf.blit(text, (xpos, ypos))
+        self.screen.blit(self.surf, self.rect)
+        self.shown_rows = rows
+        return [self.rect]
+
+
+class PygameRenderer(Renderer):
+    """ Renders the meter and the stats into a pygame window """
+
+    def __init__(self, width, height, version="", bg_color=ColorPicker.BLACK):
+        self.width = width
+        self.height = height
+        self.version = version
+        self.bg_color = bg_color
+        self.window = None
+        self.db_window = None
+        self.stats_window = None
+        self.spectrum_window = None  # created with the first spectrum, Tab switches to it
+        self.inputs_window = None  # created with the first frames of several inputs
+        self.view = 'meter'
+        self.debug_overlay = None
+        # the stats or the dB meter background were drawn over the debug overlay since it was
+        # last drawn
+        self.overlay_covered = False
+
+    def open(self):
+        init()
+        self.window = Window(window_width=self.width,
+                             window_height=self.height,
+                             window_frame=pygame.NOFRAME,
+                             bg_color=self.bg_color)
+
+        # create the various windows
+        fontSmall = pygame.font.Font('freesansbold.ttf', 12)
+
+        self.db_window = dbWindow(self.window.screen,
+                                  window_width=self.width,
+                                  window_height=200,
+                                  font=fontSmall,
+                                  bg_color=self.bg_color)
+        self.stats_window = StatsWindow(self.window.screen,
+                                        name="Stats",
+                                        xpos=5,
+                                        ypos=100,
+                                        window_width=self.width-5,
+                                        window_height=240,
+                                        bg_color=self.bg_color,
+                                        version=self.version)
+
+    def draw_levels(self, level_left, level_right):
+        if self.view != 'meter':
+            return []
+        if not self.db_window.scale_drawn:
+            self.overlay_covered = True  # the full background reaches into the overlay
+        return self.db_window.draw(LevelL=level_left, LevelR=level_right)
+
+    def draw_spectrum(self, band_centers, band_levels):
+        if self.spectrum_window is None:
+            self.spectrum_window = SpectrumWindow(self.window.screen,
+                                                  window_width=self.width,
+                                                  window_height=95,
+                                                  band_centers=band_centers,
+                                                  bg_color=self.bg_color)
+        if self.view != 'spectrum':
+            return []
+        return self.spectrum_window.draw(band_levels)
+
+    def draw_inputs(self, frames):
+        if self.inputs_window is None:
+            self.inputs_window = InputsWindow(self.window.screen,
+                                              window_width=self.width,
+                                              window_height=95,
+                                              names=[frame.name for frame in frames],
+                                              bg_color=self.bg_color)
+            # comparing the inputs is why several are metered, start with them
+            if self.view == 'meter':
+                self.view = 'inputs'
+        if self.view != 'inputs':
+            return []
+        return self.inputs_window.draw(frames)
+
+    def toggle_view(self):
+        """
+        Switch the top of the window between the dB meter, the spectrum and the inputs
+        :return: None
+        """
+        views = ['meter']
+        if self.spectrum_window is not None:
+            views.append('spectrum')
+        if self.inputs_window is not None:
+            views.append('inputs')
+        self.view = views[(views.index(self.view) + 1) % len(views)]
+        if self.view == 'spectrum':
+            self.spectrum_window.invalidate()
+        elif self.view == 'inputs':
+            self.inputs_window.invalidate()
+        else:
+            # the dB window background reaches into the stats area
+            self.db_window.invalidate()
+            self.stats_window.invalidate()
+
+    def draw_stats(self, ics, page=None, total_listeners=None):
+        dirty_rects = self.stats_window.draw(ics, page=page, total_listeners=total_listeners)
+        if dirty_rects:
+            self.overlay_covered = True
+        return dirty_rects
+
+    def draw_debug(self, rows):
+        if rows is None:
+            if self.debug_overlay is None:
+                return []
+            # blank the overlay, the stats and the meter are drawn again on the next frame
+            self.window.screen.fill(self.bg_color, self.debug_overlay.rect)
+            self.stats_window.invalidate()
+            self.db_window.invalidate()
+            if self.spectrum_window is not None:
+                self.spectrum_window.invalidate()
+            if self.inputs_window is not None:
+                self.inputs_window.invalidate()
+            rect = self.debug_overlay.rect
+            self.debug_overlay = None
+            return [rect]
+
+        if self.debug_overlay is None:
+            self.debug_overlay = DebugOverlay(self.window.screen,
+                                              xpos=0,
+                                              ypos=100,
+                                              window_width=self.width,
+                                              window_height=self.height - 100)
+        force = self.overlay_covered
+        self.overlay_covered = False
+        return self.debug_overlay.draw(rows, force=force)
+
+    def update(self, dirty_rects):
+        self.window.update(dirty_rects)
+
+    def poll_events(self):
+        actions = []
+        # event handling loop for quit events
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
+                actions.append(Renderer.QUIT)
+            elif event.type == KEYUP and event.key == K_RIGHT:
+                actions.append(Renderer.NEXT_PAGE)
+            elif event.type == KEYUP and event.key == K_LEFT:
+                actions.append(Renderer.PREVIOUS_PAGE)
+            elif event.type == KEYUP and event.key == K_TAB:
+                self.toggle_view()
+                actions.append(Renderer.REDRAW)
+            elif event.type == KEYUP and event.key == K_d:
+                actions.append(Renderer.TOGGLE_DEBUG)
+        return actions
+
+    def close(self):
+        pygame.quit()
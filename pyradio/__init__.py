@@ -1,7 +1,9 @@
 import subprocess
-import psutil
+import threading
+import signal
 import time
 import os
+import psutil
 from datetime import datetime
 
 
@@ -21,17 +23,135 @@ class StationInfo:
         return "{} : {}".format(self.name, self.vumeter_uri)
 
 
+class RestartPolicy:
+    """
+    Decides when a running mplayer has degraded enough to be restarted. mplayer is restarted
+    when its CPU use or memory growth passes a threshold or the meter has been silent for too
+    long, but never more often than once per cooldown. A stalled mplayer and a program that
+    really is silent look the same, so every silence restart without audio in between doubles
+    the silence needed for the next one
+    """
+    def __init__(self, max_cpu_percent=80.0, max_rss_growth_mb=64, silence_seconds=60,
+                 silence_dbfs=-60.0, cooldown_seconds=300, warmup_seconds=30, check_seconds=10):
+        """
+        :param max_cpu_percent: restart when mplayer uses more CPU than this, 0 disables
+        :param max_rss_growth_mb: restart when mplayer's RSS grew more than this since warmup,
+                                  0 disables
+        :param silence_seconds: restart when the meter stayed below silence_dbfs this long,
+                                doubled after every silence restart until audio returns,
+                                0 disables
+        :param silence_dbfs: peak level in dBFS below which the audio counts as silence
+        :param cooldown_seconds: minimum seconds between a (re)start and a health restart
+        :param warmup_seconds: seconds after a start before the RSS baseline is taken
+        :param check_seconds: minimum seconds between CPU/RSS samples
+        """
+        self.max_cpu_percent = max_cpu_percent
+        self.max_rss_growth = max_rss_growth_mb * 1048576
+        self.silence_seconds = silence_seconds
+        self.silence_dbfs = silence_dbfs
+        self.cooldown_seconds = cooldown_seconds
+        self.warmup_seconds = warmup_seconds
+        self.check_seconds = check_seconds
+        self.silence_restarts = 0  # silence restarts since audio was last seen
+        self.reset()
+
+    def reset(self, now=None):
+        """
+        Called whenever mplayer is (re)started
+        :param now: time.monotonic() timestamp
+        :return: None
+        """
+        now = time.monotonic() if now is None else now
+        self.start_time = now
+        self.last_sound_time = now
+        self.last_check_time = now
+        self.rss_baseline = None
+        self.cpu_percent = 0.0
+        self.rss = 0
+
+    def observe_level(self, dbfs, now=None):
+        """
+        Feed the current peak level from the VUMeter
+        :param dbfs: peak level in dBFS
+        :param now: time.monotonic() timestamp
+        :return: None
+        """
+        if dbfs > self.silence_dbfs:
+            self.last_sound_time = time.monotonic() if now is None else now
+            self.silence_restarts = 0
+
+    def check(self, player, now=None):
+        """
+        Check the health of the player
+        :param player: StreamPlayer
+        :param now: time.monotonic() timestamp
+        :return: the reason mplayer needs a restart or None when it is healthy
+        """
+        now = time.monotonic() if now is None else now
+        # the baseline is taken once warmed up, even while the cooldown still holds restarts back
+        if self.rss_baseline is None and now - self.start_time >= self.warmup_seconds:
+            self.last_check_time = now
+            self.cpu_percent, self.rss = player.resource_usage()
+            self.rss_baseline = self.rss
+        if now - self.start_time < self.cooldown_seconds:
+            return None
+
+        # e.g. a station that is off air overnight backs off to fewer and fewer restarts
+        silence_seconds = self.silence_seconds * 2 ** self.silence_restarts
+        if self.silence_seconds and now - self.last_sound_time >= silence_seconds:
+            self.silence_restarts += 1
+            return "silent for {:.0f} seconds".format(now - self.last_sound_time)
+
+        if now - self.last_check_time < self.check_seconds:
+            return None
+        self.last_check_time = now
+        self.cpu_percent, self.rss = player.resource_usage()
+
+        if self.max_cpu_percent and self.cpu_percent > self.max_cpu_percent:
+            return "CPU at {:.0f}%".format(self.cpu_percent)
+
+        if self.max_rss_growth and self.rss_baseline is not None and \
+                self.rss - self.rss_baseline > self.max_rss_growth:
+            return "RSS grew by {:.1f} MB".format((self.rss - self.rss_baseline) / 1048576)
+
+        return None
+
+
 class StreamPlayer:
     """
     The radio stream player
     """
-    def __init__(self, station_info):
+    def __init__(self, station_info, on_exit=None, restart_policy=None, pcm_sink=None,
+                 pcm_rate=44100, pcm_channels=2, pcm_chunk_bytes=8192):
+        """
+        :param station_info: StationInfo
+        :param on_exit: optional callable, called from the watcher thread when mplayer exits
+        :param restart_policy: optional RestartPolicy, mplayer is only restarted while it is
+                               still running when the policy reports it as degraded
+        :param pcm_sink: optional callable. When set mplayer decodes to a pipe instead of a
+                         sound device and pcm_sink is called with every block of interleaved
+                         signed 16 bit PCM, always whole frames, from a reader thread
+        :param pcm_rate: sample rate mplayer resamples the pipe output to
+        :param pcm_channels: channel count of the pipe output
+        :param pcm_chunk_bytes: maximum size of each block handed to pcm_sink
+        """
+        self.pcm_sink = pcm_sink
+        self.pcm_rate = pcm_rate
+        self.pcm_channels = pcm_channels
+        self.pcm_chunk_bytes = pcm_chunk_bytes
         self.station = station_info
+        self.on_exit = on_exit
+        self.restart_policy = restart_policy
+        self.restart_reason = None
+        self._group_procs = {}
         self._is_running = False
         self.started = datetime.now()
         self.process = None
-        self.pids = []
-        self.pre_play_pids = []
+        self.pgid = None
+        # process and pgid always change together, the watcher of an old mplayer must never
+        # signal the group of its replacement
+        self._lock = threading.Lock()
+        self._watcher = None
 
     def play(self, cache=4096, optional_args=[]):
 
@@ -42,67 +162,169 @@ class StreamPlayer:
             cache = 32
 
         cli_args += ['-cache', str(cache)]
+
+        if self.process is not None and self.process.poll() is None:
+            # stop the previous mplayer before it is replaced so they do not fight over the
+            # audio device
+            self.stop(timeout=1)
+
+        pass_fds = ()
+        if self.pcm_sink is not None:
+            # raw PCM goes to a dedicated pipe, mplayer's own messages stay on stdout
+            pcm_read, pcm_write = os.pipe()
+            pass_fds = (pcm_write,)
+            cli_args += ['-vo', 'null',
+                         '-ao', 'pcm:nowaveheader:file=/dev/fd/{}'.format(pcm_write),
+                         '-af', 'format=s16le,channels={}'.format(self.pcm_channels),
+                         '-srate', str(self.pcm_rate)]
+
         cli_args.append(self.station.vumeter_uri)
 
-        if self.pids:
-            # kill all mplayer processes that were created by this instance if they exist
-            for pid in self.pids:
-                try:
-                    os.kill(pid, 15)
-                except:
-                    continue
-            self.pids = []
-            time.sleep(1)  # give it time to clear the processes
-
-        # mplayer seems to open 2 processes but subprocess only knows about 1 process. we
-        # need to track any PID changes for mplayer as the delta is the actual process that are
-        # being opened by subprocess.
-        self.pre_play_pids = [proc.pid for proc in psutil.process_iter() if proc.name() ==
-                              'mplayer']
-
-        self.process = subprocess.Popen(cli_args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        self._is_running = self.is_playing()
+        # mplayer opens 2 processes but subprocess only knows about 1 of them. Starting it in its
+        # own session makes mplayer the leader of a new process group which also holds the
+        # 2nd process, so the whole group can be signalled without scanning the process table
+        try:
+            process = subprocess.Popen(cli_args, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL, start_new_session=True,
+                                       pass_fds=pass_fds)
+        except BaseException:
+            if self.pcm_sink is not None:
+                # the player task retries every few seconds, leaked pipes would add up
+                os.close(pcm_read)
+                os.close(pcm_write)
+            raise
+        with self._lock:
+            self.process = process
+            self.pgid = process.pid
+            self._is_running = True
         self.started = datetime.now()
-        # need to sleep for a couple of seconds as it take mplayer 1-2 seconds
-        # to spin up the 2nd process
-        time.sleep(2)
-        self.pids = [proc.pid for proc in psutil.process_iter() if proc.name() == 'mplayer' and
-                     not self.pre_play_pids.__contains__(proc.pid)]
-
-    def stop(self):
-        # subprocess.kill() will kill the process that subprocess is aware of, however,
-        # mplayer opens 2 processes so we need to kill all mplayer processes that were
-        # opened prior to logging pre_play_pids
-        pids = [proc.pid for proc in psutil.process_iter() if proc.name() == 'mplayer' and
-                not self.pre_play_pids.__contains__(proc.pid)]
-        for pid in pids:
-            os.kill(pid, 15)  # SIGTERM = 16
-        self.pids = []
-        self.started = datetime.now()  # reset the time stamp
-        self._is_running = False
+        self._group_procs = {}
+        if self.restart_policy is not None:
+            self.restart_policy.reset()
 
-    def is_playing(self):
-        # If the subprocess.Popen.poll() returns a value then the process is not running
-        if self.process.poll():
+        # the watcher blocks in waitpid() until this mplayer exits and flags it immediately
+        self._watcher = threading.Thread(target=self._watch, args=(process,),
+                                         name='StreamPlayerWatcher', daemon=True)
+        self._watcher.start()
+
+        if self.pcm_sink is not None:
+            os.close(pcm_write)  # only mplayer writes, EOF arrives when it exits
+            threading.Thread(target=self._pump, args=(pcm_read,), name='StreamPlayerPCM',
+                             daemon=True).start()
+
+    def _pump(self, fd):
+        """
+        Reader thread for the PCM pipe. Reads into one reusable buffer and only hands whole
+        frames to pcm_sink, a partial frame is kept for the next read
+        :param fd: read end of the PCM pipe
+        :return: None
+        """
+        frame_bytes = 2 * self.pcm_channels
+        buf = bytearray(self.pcm_chunk_bytes - self.pcm_chunk_bytes % frame_bytes)
+        view = memoryview(buf)
+        pos = 0
+        try:
+            while True:
+                count = os.readv(fd, [view[pos:]])
+                if not count:
+                    break
+                pos += count
+                whole = pos - pos % frame_bytes
+                if whole:
+                    self.pcm_sink(view[:whole])
+                    view[:pos - whole] = view[whole:pos]
+                    pos -= whole
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _watch(self, process):
+        process.wait()
+        with self._lock:
+            if process is not self.process:
+                return  # an old mplayer that has already been replaced
             self._is_running = False
-        else:
-            # if the subprocess.Popen.poll() returns None then the process is still running
-
-            # Periodically the stream will be cutoff for a brief moment. However, the way mplayer
-            # is launched via subprocess causes 2 processes to be opened but subprocess only knows
-            # about the 1st pid. Since we track the pids in self.pids then we can see if both pids
-            # are still running. if not then kill the remaining pid and set self._is_running=false
-            pids = [proc.pid for proc in psutil.process_iter() if proc.name() == 'mplayer' and
-                    not self.pre_play_pids.__contains__(proc.pid)]
-
-            # the longer mplayer streams the more CPU resources are used. So every hour
-            # (3600 seconds) lets stop mplayer.
-            ntime = datetime.now()
-            time_delta = ntime - self.started
-            if (ntime.minute == 30 and ntime.second == 5) or (ntime.minute == 0 and ntime.second == 5):
-                self.stop()
-            else:
-                self._is_running = True
+        # take down the rest of the group in case only the parent process exited
+        self._signal_group(process, signal.SIGTERM)
+        if self.on_exit is not None:
+            self.on_exit()
+
+    def _signal_group(self, process, sig):
+        """
+        Signal the process group of an mplayer, unless it has been replaced in the meantime
+        :param process: Popen of the mplayer whose group is signalled
+        :param sig: signal number
+        :return: None
+        """
+        with self._lock:
+            if process is not self.process or self.pgid is None:
+                return
+            try:
+                os.killpg(self.pgid, sig)
+            except (ProcessLookupError, PermissionError):
+                pass
+
+    def stop(self, timeout=None):
+        """
+        Stop every mplayer process of the group this instance started
+        :param timeout: optional seconds to wait for mplayer to exit, SIGKILL after that
+        :return: None
+        """
+        process = self.process
+        self._is_running = False
+        if process is None or process.poll() is not None:
+            return  # already gone, the watcher has cleaned up the group
+        self._signal_group(process, signal.SIGTERM)
+        if timeout is not None:
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._signal_group(process, signal.SIGKILL)
 
+    @property
+    def running(self):
+        """ Whether mplayer is running, without running the restart policy like is_playing() """
         return self._is_running
 
+    def resource_usage(self):
+        """
+        CPU and memory use of the whole mplayer process group
+        :return: (cpu percent since the previous call, RSS in bytes)
+        """
+        if self.process is None or self.process.poll() is not None:
+            return 0.0, 0
+
+        try:
+            parent = self._group_procs.get(self.process.pid) or psutil.Process(self.process.pid)
+            members = [parent] + parent.children(recursive=True)
+        except psutil.Error:
+            return 0.0, 0
+
+        # keep the psutil.Process objects around, cpu_percent() measures since the last call
+        procs = {}
+        cpu_percent = 0.0
+        rss = 0
+        for proc in members:
+            proc = self._group_procs.get(proc.pid, proc)
+            try:
+                cpu_percent += proc.cpu_percent(interval=None)
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+            procs[proc.pid] = proc
+        self._group_procs = procs
+
+        return cpu_percent, rss
+
+    def is_playing(self):
+        # the watcher thread clears _is_running as soon as mplayer exits so this never has to
+        # look at the process table
+        if self._is_running and self.restart_policy is not None:
+            reason = self.restart_policy.check(self)
+            if reason:
+                # mplayer has degraded, stopping it makes the caller start a fresh one
+                self.restart_reason = reason
+                self.stop(timeout=1)
+
+        return self._is_running
@@ -3,8 +3,9 @@ version = "2.1.2"
 """
  Streaming Meter
  Author: Sammy Shuck
- Python Compatibility: Python 3.2, 3.4, 3.5, 3.6.4
- Requirements: python-pyaudio, python-pygame, Linux OS, mplayer
+ Python Compatibility: Python 3.7+
+ Requirements: python-pyaudio, python-numpy, Linux OS, mplayer, python-pygame (pygame display),
+               python-scipy (lufs meter mode)
  This program is designed specifically for Raspberry Pi 3 Model B for a client radio
  station who provides their own
  streaming services.
@@ -12,32 +13,36 @@ version = "2.1.2"
 
 import os
 import sys
-import audioop
-import math
 import time
-import array
 import xml.etree.ElementTree as ET
 import threading
-import requests
-import pygame
-import pyaudio
 import argparse
 import logging
-from datetime import datetime, timedelta
+import asyncio
+import hashlib
+import json
+import signal
+from collections import namedtuple
+from datetime import datetime
 from configparser import ConfigParser, NoOptionError
-from requests.exceptions import ConnectionError
-from pyradio import StationInfo, StreamPlayer
-from pygame.locals import QUIT, KEYUP, K_ESCAPE
+from pyradio import StationInfo, StreamPlayer, RestartPolicy
+import meter_levels
+import ballistics
+from metrics_exporter import MetricsExporter
+from probes import Probes, Histogram
+from pacing import FrameScheduler
+from meter_inputs import InputConfig, InputFanIn
+from display import create_renderer, Renderer
 
 
 # ToDo: Add logging
 
-# setup code
-pygame.init()
-pygame.mixer.quit()  # stops unwanted audio output on some computers
+# CLASS DEFINITIONS
+# One Icecast server from the config file and the mounts to monitor on it
+IcecastServerConfig = namedtuple('IcecastServerConfig',
+                                 ['name', 'server', 'port', 'user', 'pswd', 'mounts'])
 
 
-# CLASS DEFINITIONS
 class Args:
     """
     Args Class handles the cmdline arguments passed to the code
@@ -73,274 +78,157 @@ class Args:
         except NoOptionError:
             pass
 
+        #  [player]  #
+        # Pipeline=True decodes the stream straight into the meter instead of through the ALSA
+        # loopback device
+        self.pipeline = conparser.getboolean('player', 'Pipeline', fallback=False)
+        # health thresholds that make mplayer restart, 0 disables a check
+        self.restart_max_cpu = conparser.getfloat('player', 'RestartMaxCPUPercent', fallback=80.0)
+        self.restart_max_rss_growth = conparser.getfloat('player', 'RestartMaxRSSGrowthMB',
+                                                         fallback=64)
+        self.restart_silence_seconds = conparser.getfloat('player', 'RestartSilenceSeconds',
+                                                          fallback=60)
+        self.restart_silence_db = conparser.getfloat('player', 'RestartSilenceDB', fallback=-60.0)
+        self.restart_cooldown = conparser.getfloat('player', 'RestartCooldownSeconds',
+                                                   fallback=300)
+
+        #  [audio]  #
+        # remembers the resolved sound device between restarts, empty disables the cache
+        self.device_cache = conparser.get('audio', 'DeviceCache',
+                                          fallback='/var/tmp/vumeter_device.json')
+        # sample, vu, ppm, ppm-bbc, truepeak or lufs
+        self.meter_mode = conparser.get('audio', 'MeterMode', fallback='sample')
+        # HopSeconds > 0 updates the levels over the last WindowSeconds every hop
+        self.window_seconds = conparser.getfloat('audio', 'WindowSeconds', fallback=0.2)
+        self.hop_seconds = conparser.getfloat('audio', 'HopSeconds', fallback=0.0)
+
+        #  [input:<name>]  #
+        # several inputs metered side by side, each by its own worker process. The first one
+        # drives the main meter. Without these sections the loopback device is metered
+        self.inputs = []
+        for section in conparser.sections():
+            if not section.startswith('input:'):
+                continue
+            self.inputs.append(InputConfig(name=section.split(':', 1)[1].strip(),
+                                           device=conparser.get(section, 'Device'),
+                                           channels=conparser.getint(section, 'Channels',
+                                                                     fallback=1)))
+        if self.inputs and self.pipeline:
+            print("Pipeline is not used together with [input:] sections, metering the inputs")
+            self.pipeline = False
+
+        #  [display]  #
+        # pygame, terminal or null
+        self.display_backend = conparser.get('display', 'Backend', fallback='pygame')
+        self.framerate = conparser.getint('display', 'FrameRate', fallback=FRAMERATE)
+        # under CPU pressure the stats are redrawn less often and then the frame rate is lowered
+        # down to MinFrameRate
+        self.min_framerate = conparser.getint('display', 'MinFrameRate',
+                                              fallback=min(self.framerate, MIN_FRAMERATE))
+        self.stats_rate = conparser.getfloat('display', 'StatsRate', fallback=1.0)
+        self.spectrum = conparser.getboolean('display', 'Spectrum', fallback=False)
+        if self.inputs and self.spectrum:
+            # the workers only publish levels, the display process never sees the audio
+            print("Spectrum is not used together with [input:] sections, metering the inputs")
+            self.spectrum = False
+
+        #  [metrics]  #
+        # HTTP endpoint serving the levels and Icecast stats, Port=0 turns it off
+        self.metrics_port = conparser.getint('metrics', 'Port', fallback=0)
+        self.metrics_bind = conparser.get('metrics', 'Bind', fallback='0.0.0.0')
+
         #  [icecast]  #
         self.stream_name = conparser.get('icecast', 'streamName')
-        self.mountpoint = conparser.get('icecast', 'mountPoint')
+        self.mountpoints = self._split_mounts(conparser.get('icecast', 'mountPoint'))
+        self.mountpoint = self.mountpoints[0]
         self.icecast_server = conparser.get('icecast', 'server', fallback='127.0.0.1')
         self.port = conparser.get('icecast', 'port', fallback='8000')
         self.icecast_user = conparser.get('icecast', 'user', fallback='admin')
         self.__clear_password = conparser.get('icecast', 'pswd', fallback='hackme')
 
-    def get_pwd(self):
-        return self.__clear_password
-
-
-class ColorPicker:
-    """ Used for pygame coloring to make it easier to pick a color by name instead of color code"""
-    WHITE = (255, 255, 255)
-    BLACK = (0, 0, 0)
-    RED = (255, 50, 50)
-    YELLOW = (255, 255, 0)
-    GREEN = (0, 255, 50)
-    BLUE = (50, 50, 255)
-    GREY = (200, 200, 200)
-    ORANGE = (200, 100, 50)
-    CYAN = (0, 255, 255)
-    MAGENTA = (255, 0, 255)
-    TRANS = (1, 1, 1)
-
-
-class Window:
-    """ Main window class """
-
-    def __init__(self, window_width, window_height, window_frame=pygame.NOFRAME,
-                 window_caption="VU Meter", bg_color=(0, 0, 0),
-                 font=pygame.font.Font('freesansbold.ttf', 12)):
-        self.width = window_width
-        self.height = window_height
-        self.caption = window_caption
-        self.bg_color = bg_color
-        self.font = font
-
-        self.screen = pygame.display.set_mode((window_width, window_height), window_frame)
-        pygame.display.set_caption(window_caption)
-        self.screen.fill(self.bg_color)
+        #  [icecast:<name>]  #
+        # additional servers to monitor, the main [icecast] server is always the first one
+        self.icecast_servers = [IcecastServerConfig(name='icecast',
+                                                    server=self.icecast_server,
+                                                    port=self.port,
+                                                    user=self.icecast_user,
+                                                    pswd=self.__clear_password,
+                                                    mounts=self.mountpoints)]
+        for section in conparser.sections():
+            if not section.startswith('icecast:'):
+                continue
+            self.icecast_servers.append(
+                IcecastServerConfig(name=section.split(':', 1)[1].strip(),
+                                    server=conparser.get(section, 'server', fallback='127.0.0.1'),
+                                    port=conparser.get(section, 'port', fallback='8000'),
+                                    user=conparser.get(section, 'user', fallback='admin'),
+                                    pswd=conparser.get(section, 'pswd', fallback='hackme'),
+                                    mounts=self._split_mounts(conparser.get(section,
+                                                                            'mountPoint'))))
 
     @staticmethod
-    def update():
-        """
-            update the pygame window
-            :return: None
-        """
-        pygame.display.update()
-
-
-class dbWindow:
-    """ dB Window class for displaying the dB levels on the VU meter"""
-
-    def __init__(self, window_width, window_height, bg_color=(0, 0, 0),
-                 font=pygame.font.Font('freesansbold.ttf', 12)):
-        self.width = window_width
-        self.height = window_height
-        self.bg_color = bg_color
-        self.font = font
-        self.surf = pygame.Surface((self.width, self.height))
-        self.updating = False
-        self.metering = {'green': 30,  # -10
-                         'yellow': 36,  # -4
-                         'red': 39,  # -1
-                        }
-
-    def draw(self, LevelL=0, LevelR=0):
-        """
-        Draw the db meter
-        :param LevelL: Left channel Level
-        :param LevelR: Right Channel Level
-        :return: Nothing
-        """
-        self.surf.fill(self.bg_color)
-
-        # Write the scale and draw in the lines
-        xpos = 0
-        xpos_step_size = 47
-        for dB in range(-40, 1, 4):
-
-            # dB numbers on the scale
-            # --  0  --
-            #    ...
-            # -- -20 --
-            #    ...
-            # -- -40 --
-            # draw the numbers
-            str_number = str(dB)
-            text = self.font.render(str_number, 1, (255, 255, 255))
-            text.get_rect()
-            self.surf.blit(text, (xpos, 40))
-
-            # draw the lines before and after the numbers
-            pygame.draw.line(self.surf, (255, 255, 255), (5 + xpos, 25), (5 + xpos, 35), 1)
-            pygame.draw.line(self.surf, (255, 255, 255), (5 + xpos, 55), (5 + xpos, 65), 1)
-            xpos += xpos_step_size
-
-        # Draw the meter boxes
-        # Green = -40 to -20
-        # Yellow = -10 to -5
-        # Red = -5 to 0
-        # Clipping = +1 +
-
-        # LEFT CHANNEL
-        ypos = 10
-        for i in range(0, LevelL):
-            xpos = (i * 12)-1
-            if i < self.metering['green']:
-                pygame.draw.rect(self.surf, ColorPicker.GREEN, (xpos, ypos, 30, 12))
-            elif self.metering['green'] <= i < self.metering['yellow']:
-                pygame.draw.rect(self.surf, ColorPicker.YELLOW, (xpos, ypos, 30, 12))
-            elif self.metering['yellow'] <= i < self.metering['red']:
-                pygame.draw.rect(self.surf, ColorPicker.RED, (xpos, ypos, 30, 12))
-            else:
-                pygame.draw.rect(self.surf, ColorPicker.WHITE, (xpos, ypos, 30, 12))
-
-        # RIGHT CHANNEL
-        ypos = 69
-        for i in range(0, LevelR):
-            xpos = (i * 12)-1
-            if i < self.metering['green']:
-                pygame.draw.rect(self.surf, ColorPicker.GREEN, (xpos, ypos, 30, 12))
-            elif self.metering['green'] <= i < self.metering['yellow']:
-                pygame.draw.rect(self.surf, ColorPicker.YELLOW, (xpos, ypos, 30, 12))
-            elif self.metering['yellow'] <= i < self.metering['red']:
-                pygame.draw.rect(self.surf, ColorPicker.RED, (xpos, ypos, 30, 12))
-            else:
-                pygame.draw.rect(self.surf, ColorPicker.WHITE, (xpos, ypos, 30, 12))
+    def _split_mounts(mountpoints):
+        # mountPoint can hold a comma separated list of mounts
+        return [mount.strip() for mount in mountpoints.split(',') if mount.strip()]
 
-        mainWindow.screen.blit(self.surf, (0, 0))
+    def get_pwd(self):
+        return self.__clear_password
 
-    def threaded_draw(self, LevelL=0, LevelR=0):
-        """
-        Draw the window in a separate thread so that the main window is not being locked up
-        :param LevelL: Left channel level
-        :param LevelR: Right channel level
-        :return:
-        """
-        if not self.updating:
-            self.updating = True
-            t = threading.Thread(target=self.draw(LevelL=LevelL,
-                                                  LevelR=LevelR
-                                                 )
-                                )
-            t.start()
 
+def hardware_fingerprint():
+    """
+    Identifies the sound hardware so a cached device lookup is dropped when it changes
+    :return: str or None when the sound cards can not be listed
+    """
+    try:
+        with open('/proc/asound/cards', 'rb') as cards:
+            return hashlib.sha1(cards.read()).hexdigest()
+    except OSError:
+        return None
 
-class StatsWindow:
-    """ StatsWindow class used for displaying Icecast2 streaming statistics """
 
-    def __init__(self, name, xpos, ypos, window_width, window_height):
-        self.name = name
-        self.x_position = xpos
-        self.y_position = ypos
-        self.width = window_width
-        self.height = window_height
-        self.surf = pygame.surface.Surface((window_width, window_height))  # size of the whole box
-        self.font = self.font = pygame.font.SysFont("Verdana", 12)
-        self.surf.fill(BGCOLOR)
-        self.updating = False
-
-    def draw(self, ics):
-        """
-        draw the streaming stats window
-        :param ics: IcecastServer class
-        :return: Nothing
-        """
-        self.surf_copy = self.surf.copy()
-
-        if not ics.Mount:
-            # no mount points so lets create a NULL mount point
-            ics.Mount = NullMountpoint()
-
-        # define text surfaces
-        self.title_surf = self.font.render("{}".format(
-            ics.Mount.ServerDescription),
-                                           True,
-                                           ColorPicker.WHITE,
-                                           BGCOLOR)
-
-        self.serverStart_surf = self.font.render("Server Start:  {}".format(
-            ics.server_start),
-                                                 True,
-                                                 ColorPicker.WHITE,
-                                                 BGCOLOR)
-
-        self.streamStart_surf = self.font.render("Stream Service Start:  {}".format(
-            ics.Mount.StreamStart),
-                                                 True,
-                                                 ColorPicker.WHITE,
-                                                 BGCOLOR)
-
-        self.currentListener_surf = self.font.render("Current Listeners:  {}".format(
-            ics.Mount.Listeners),
-                                                     True,
-                                                     ColorPicker.WHITE,
-                                                     BGCOLOR)
-
-        self.peakListener_surf = self.font.render("Peak Listeners:  {}".format(
-            ics.Mount.ListenerPeak),
-                                                  True,
-                                                  ColorPicker.WHITE,
-                                                  BGCOLOR)
-
-        self.slowListener_surf = self.font.render("Slow Listeners:  {}".format(
-            ics.Mount.SlowListeners),
-                                                  True,
-                                                  ColorPicker.WHITE,
-                                                  BGCOLOR)
-        self.version_surf = self.font.render("Version:  {}".format(version),
-                                             True,
-                                             ColorPicker.WHITE,
-                                             BGCOLOR)
-
-        # define text locations and blit
-        self._text_display_queue(self.title_surf, xpos=0, ypos=0)
-        self._text_display_queue(self.serverStart_surf, xpos=0, ypos=20)
-        self._text_display_queue(self.streamStart_surf, xpos=0, ypos=40)
-        self._text_display_queue(self.currentListener_surf, xpos=0, ypos=70)
-        self._text_display_queue(self.peakListener_surf, xpos=200, ypos=70)
-        self._text_display_queue(self.slowListener_surf, xpos=0, ypos=90)
-        self._text_display_queue(self.version_surf, xpos=0, ypos=120)
-
-        mainWindow.screen.blit(self.surf_copy, (self.x_position, self.y_position))
-
-        self.updating = False
-
-    def threaded_draw(self, ics):
-        """
-        Draw the window ina separate thread to prevent locking up the window during the redraw
-        :param ics: IcecastServer class
-        :return:
-        """
-        if not self.updating:
-            self.updating = True
-            t = threading.Thread(target=self.draw(ics))
-            t.start()
-
-    def _text_display_queue(self, _surface, xpos, ypos):
-        """
-        Draw the text surfaces
-        :param _surface: text rect
-        :param xpos:
-        :param ypos:
-        :return: None
-        """
-        _rect = _surface.get_rect(x=xpos, y=ypos)
-        self.surf_copy.blit(_surface, _rect)
+class AudioStreamError(Exception):
+    """ The input stream stopped delivering audio, VUMeter.recover() reopens it """
+    pass
 
 
 class VUMeter:
     """ VU Meter class handles the pyaudio input stream as well as analyzing the stream data"""
-    FORMAT = pyaudio.paInt16
-    pa = pyaudio.PyAudio()
+    SAMPLE_WIDTH = 2  # bytes per sample for paInt16
+    DEVICE_NAMES = ('Loopback: PCM (hw:1,1)', 'Microphone (Hyper')
+    pa = None  # one PyAudio instance shared by every VUMeter, created on first use
+    pa_fingerprint = None  # sound cards PortAudio found when pa was created
     sound_device_index = 0
+    STALL_SECONDS = 1.0  # a callback stream without audio for this long has lost its device
+    REOPEN_ATTEMPTS = 3  # failed reopens before PortAudio itself is initialized again
+    # peak hold fall in meter segments per second of audio, the 0.2 per 0.2 s block of the
+    # original blocking read whatever the block or hop size
+    PEAK_FALL_PER_SECOND = 1.0
 
     def __init__(self, sample_rate=44100, channels=2, input_channel=1,
-                 buffer_size=1024, record_seconds=0.1, input_stream=True):
-
-        for index in range(0, self.pa.get_device_count()):
-            sound_device = self.pa.get_device_info_by_index(index)
-
-            if sound_device['name'].find('Loopback: PCM (hw:1,1)') != -1 \
-               or sound_device['name'].find('Microphone (Hyper') != -1:
-                self.sound_device = sound_device
-                self.sound_device_index = index
+                 buffer_size=1024, record_seconds=0.1, input_stream=True, use_callback=False,
+                 input_source='pyaudio', device_cache=None, meter_mode='sample',
+                 window_seconds=None, hop_seconds=None, spectrum=False, probes=None,
+                 device_names=None):
+
+        # device_names picks the sound device by parts of its name. Without them one of
+        # DEVICE_NAMES is used and the first device when none of those is found
+        self.device_names = tuple(device_names) if device_names else self.DEVICE_NAMES
+        self.device_required = bool(device_names)
+
+        # input_source='pipe' meters audio pushed in through feed(), e.g. by a StreamPlayer
+        # decoding the stream to a pipe, no sound device is used at all
+        self.input_source = input_source
+        if input_source == 'pipe':
+            use_callback = True
+
+        # device_cache is a file remembering the resolved device, so a restart on the same
+        # hardware does not have to query every device again
+        self.device_cache = device_cache
+        self.device_from_cache = False
+        self.sound_device = None
+        if input_source == 'pyaudio':
+            self._resolve_device()
 
         if isinstance(sample_rate, int):
             self.sample_rate = sample_rate
@@ -352,71 +240,422 @@ class VUMeter:
 
         self.peak_left = 0
         self.peak_right = 0
+        self.level_left = 0
+        self.level_right = 0
+        self.levels = [0] * channels
+        self.peaks, self.rms, self.dbfs = meter_levels.channel_levels(b'', channels)
+        self.clips = [0] * channels  # metered blocks or hops at full scale, per channel
         self.channels = channels
         self.input_channel = input_channel
         self.buffer_size = buffer_size
         self.record_seconds = record_seconds
         self.input_stream = input_stream
         self.stream = None
+        # overflows, resyncs and reopens are counted here, pass the runtime's Probes to get
+        # them on the debug overlay and the metrics
+        self.probes = probes if probes is not None else Probes()
+        self._overflows = 0  # input overflows flagged to the callback by PortAudio
+        self._overflows_counted = 0
+        self._last_audio = None  # when read_stream() last found new audio in the ring
+        self._failed_reopens = 0
+
+        # callback capture mode: pyaudio calls _stream_callback on its own audio thread which
+        # copies each chunk into a preallocated ring buffer holding the last record_seconds
+        # of audio. read_stream() then only analyzes the ring and never blocks on the device.
+        self.use_callback = use_callback
+        self.chunks_per_read = max(1, int(self.sample_rate / self.buffer_size * self.record_seconds))
+        self._ring = bytearray(self.chunks_per_read * self.buffer_size *
+                               self.channels * self.SAMPLE_WIDTH)
+        self._ring_view = memoryview(self._ring)
+        self._ring_pos = 0
+        self._ring_lock = threading.Lock()
+        self._chunks_written = 0  # incremented by the audio thread for every chunk received
+        self._chunks_analyzed = 0
+
+        # every read is analyzed from the same preallocated capture buffer so steady state
+        # metering does not allocate, pyaudio chunks are copied in place through a memoryview
+        self._capture = bytearray(len(self._ring))
+        self._capture_view = memoryview(self._capture)
+        self._scratch = meter_levels.make_scratch(self.chunks_per_read * self.buffer_size,
+                                                  self.channels)
+
+        # meter_mode selects the ballistics driving the bars, 'sample' is the plain sample peak
+        # of the last record_seconds. The other modes keep state between reads, so they are fed
+        # only the audio that arrived since the previous read, in order.
+        self.meter_mode = meter_mode
+        self.ballistics = ballistics.create_ballistics(meter_mode, self.sample_rate, channels)
+        self.meter_db = self.dbfs
+        self._bytes_written = 0
+        self._bytes_analyzed = 0
+        self._fresh = bytearray(len(self._ring))
+        self._fresh_view = memoryview(self._fresh)
+
+        # hop_seconds turns on sliding window metering, the levels cover the last
+        # window_seconds (record_seconds by default) and are updated every hop_seconds from
+        # the fresh audio only, instead of re-analyzing the whole ring on every read
+        self.sliding = None
+        if hop_seconds:
+            window_frames = int(self.sample_rate * (window_seconds or record_seconds))
+            self.sliding = meter_levels.SlidingLevels(channels, window_frames,
+                                                      int(self.sample_rate * hop_seconds))
+
+        # spectrum=True also calculates 1/3 octave band levels of the capture buffer
+        self.spectrum = None
+        self.band_levels = None
+        if spectrum:
+            self.spectrum = meter_levels.Spectrum(self.sample_rate, channels,
+                                                  len(self._capture) //
+                                                  (channels * self.SAMPLE_WIDTH))
+            self.band_levels = self.spectrum.levels
+
+    @classmethod
+    def get_pa(cls):
+        """
+        The shared PyAudio instance, pyaudio is imported and initialized on the first call
+        :return: pyaudio.PyAudio
+        """
+        if cls.pa is None:
+            import pyaudio
+            cls.pa = pyaudio.PyAudio()
+            cls.pa_fingerprint = hardware_fingerprint()
+        return cls.pa
+
+    @classmethod
+    def reset_pa(cls):
+        """
+        Terminate the shared PyAudio instance, the next get_pa() initializes PortAudio again and
+        with it the device list. Streams opened on the old instance are no longer usable
+        :return: None
+        """
+        if cls.pa is not None:
+            try:
+                cls.pa.terminate()
+            except Exception:
+                pass
+            cls.pa = None
+
+    def _resolve_device(self):
+        """
+        Find the input device, from the device cache when the hardware has not changed
+        :return: None
+        """
+        fingerprint = hardware_fingerprint()
+        if self.device_cache and fingerprint:
+            try:
+                with open(self.device_cache) as cache_file:
+                    cached = json.load(cache_file)
+                if cached.get('fingerprint') == fingerprint:
+                    self.sound_device = cached['device']
+                    self.sound_device_index = cached['index']
+                    self.device_from_cache = True
+                    return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        pa = self.get_pa()
+        for index in range(0, pa.get_device_count()):
+            sound_device = pa.get_device_info_by_index(index)
+
+            if any(sound_device['name'].find(name) != -1 for name in self.device_names):
+                self.sound_device = sound_device
+                self.sound_device_index = index
+
+        if self.sound_device is None and self.device_required:
+            raise IOError("no sound device matching {}".format(", ".join(self.device_names)))
+
+        if self.device_cache and fingerprint and self.sound_device is not None:
+            try:
+                with open(self.device_cache, 'w') as cache_file:
+                    json.dump({'fingerprint': fingerprint,
+                               'index': self.sound_device_index,
+                               'device': {'name': self.sound_device['name'],
+                                          'defaultSampleRate':
+                                              self.sound_device['defaultSampleRate']}},
+                              cache_file)
+            except OSError:
+                pass
 
     def open_stream(self):
-        self.stream = self.pa.open(format=self.FORMAT,
-                                   channels=self.channels,
-                                   rate=self.sample_rate,
-                                   input=self.input_stream,
-                                   frames_per_buffer=self.buffer_size,
-                                   input_device_index=self.sound_device_index)
+        if self.input_source == 'pipe':
+            return  # audio arrives through feed()
 
-    def read_stream(self):
-        data = array.array('h')
-        for i in range(0, int(self.sample_rate / self.buffer_size * self.record_seconds)):
-            data.fromstring(self.stream.read(self.buffer_size, exception_on_overflow=False))
+        import pyaudio
+        self._pa_input_overflow = pyaudio.paInputOverflow
+        self._pa_input_overflowed = pyaudio.paInputOverflowed
+        stream_kwargs = {}
+        if self.use_callback:
+            self._pa_continue = pyaudio.paContinue
+            stream_kwargs['stream_callback'] = self._stream_callback
+
+        try:
+            self.stream = self.get_pa().open(format=pyaudio.paInt16,
+                                             channels=self.channels,
+                                             rate=self.sample_rate,
+                                             input=self.input_stream,
+                                             frames_per_buffer=self.buffer_size,
+                                             input_device_index=self.sound_device_index,
+                                             **stream_kwargs)
+        except (IOError, OSError, ValueError):
+            if not self.device_from_cache:
+                raise
+            # the cached device is stale, look it up again and retry once
+            self.device_cache_invalidate()
+            self._resolve_device()
+            self.open_stream()
+        self._last_audio = time.monotonic()
+
+    def close_stream(self):
+        """
+        Stop and close the input stream, errors of a stream whose device is gone are ignored
+        :return: None
+        """
+        stream, self.stream = self.stream, None
+        if stream is None:
+            return
+        try:
+            stream.stop_stream()
+        except Exception:
+            pass
+        try:
+            stream.close()
+        except Exception:
+            pass
 
-        self._get_current_levels(data)
+    def recover(self):
+        """
+        Reopen the input stream after an AudioStreamError. The shared PyAudio instance is kept
+        as long as the sound cards are the same, only a changed card list or repeated failures
+        initialize PortAudio again, since it only enumerates the devices when it starts.
+        Blocks for the time PortAudio needs, call it off the event loop
+        :return: 'reopen' or 'reinit'
+        """
+        self.close_stream()
+        # without /proc/asound both fingerprints are None, then only failures escalate
+        if (hardware_fingerprint() == VUMeter.pa_fingerprint and
+                self._failed_reopens < self.REOPEN_ATTEMPTS):
+            try:
+                self.open_stream()
+            except (IOError, OSError, ValueError):
+                self._failed_reopens += 1
+                raise
+            self._failed_reopens = 0
+            self.probes.count('audio_reopens')
+            return 'reopen'
+
+        # the cards changed, e.g. a USB interface was plugged in again, look the device up on
+        # a fresh PortAudio
+        self.reset_pa()
+        if self.device_cache:
+            self.device_cache_invalidate()
+        self._resolve_device()
+        self.open_stream()
+        self._failed_reopens = 0
+        self.probes.count('audio_reinits')
+        return 'reinit'
+
+    def device_cache_invalidate(self):
+        self.device_from_cache = False
+        try:
+            os.remove(self.device_cache)
+        except OSError:
+            pass
 
-    def _get_current_levels(self, data):
+    def _stream_callback(self, in_data, frame_count, time_info, status_flags):
+        """
+        pyaudio stream callback, runs on the PortAudio thread. Keep it short and never block.
+        :param in_data: raw interleaved paInt16 audio bytes
+        :param frame_count: number of frames in in_data
+        :param time_info: unused
+        :param status_flags: paInputOverflow is counted, the ring simply continues with the
+                             audio that did arrive
+        :return: (None, pyaudio.paContinue)
+        """
+        if status_flags & self._pa_input_overflow:
+            self._overflows += 1
+        self.feed(in_data)
+        return None, self._pa_continue
 
-        left_data = audioop.tomono(data, 2, 1, 0)
-        amplitude_left = ((audioop.max(left_data, 2)) / 32767)
-        self.level_left = (int(41 + (20 * (math.log10(amplitude_left + (1e-40))))))
+    def feed(self, in_data):
+        """
+        Copy audio into the ring buffer, read_stream() meters the most recent record_seconds.
+        Safe to call from any thread
+        :param in_data: interleaved paInt16 audio, must hold whole frames
+        :return: None
+        """
+        data = memoryview(in_data)
+        ring_len = len(self._ring)
+        if len(data) > ring_len:
+            # only the most recent ring_len bytes matter
+            data = data[-ring_len:]
+
+        with self._ring_lock:
+            pos = self._ring_pos
+            first = min(len(data), ring_len - pos)
+            self._ring_view[pos:pos + first] = data[:first]
+            if first < len(data):
+                self._ring_view[0:len(data) - first] = data[first:]
+            self._ring_pos = (pos + len(data)) % ring_len
+            self._chunks_written += 1
+            self._bytes_written += len(in_data)
 
-        right_data = audioop.tomono(data, 2, 0, 1)
-        amplitude_right = ((audioop.max(right_data, 2)) / 32767)
-        self.level_right = (int(41 + (20 * (math.log10(amplitude_right + (1e-40))))))
+    def read_stream(self):
+        """
+        Meter the latest audio
+        :raises AudioStreamError: the device stopped delivering audio, recover() reopens it
+        :return: None
+        """
+        if self.use_callback:
+            self._read_ring()
+            return
 
-        # Use the levels to set the peaks
+        self._resync()
+        offset = 0
+        for i in range(0, self.chunks_per_read):
+            try:
+                # PyAudio only reports an overflow by raising, it is counted below
+                chunk = self.stream.read(self.buffer_size, exception_on_overflow=True)
+            except (IOError, OSError) as e:
+                if getattr(e, 'errno', None) == self._pa_input_overflowed:
+                    self.probes.count('audio_overflows')
+                    continue  # whatever was read so far is still good
+                raise AudioStreamError("audio input lost: {}".format(e)) from e
+            self._capture_view[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+
+        if not offset:
+            return
+        data = self._capture_view[:offset]
+        self._get_current_levels(data, data)
+
+    def _resync(self):
+        """
+        Blocking mode: drop audio that queued up in PortAudio while the meter was busy, so the
+        meter shows the current audio again instead of lagging behind until the input overflows
+        :return: None
+        """
+        try:
+            backlog = self.stream.get_read_available()
+        except (IOError, OSError) as e:
+            raise AudioStreamError("audio input lost: {}".format(e)) from e
+        stale = backlog - self.chunks_per_read * self.buffer_size
+        if stale > self.buffer_size:
+            self.stream.read(stale, exception_on_overflow=False)
+            self.probes.count('audio_resyncs')
+
+    def _read_ring(self):
+        """
+        Non-blocking read for callback mode. Levels are only recalculated when the audio thread
+        has delivered new audio since the last call, so the peak decay still follows the audio
+        rate and not the display rate.
+        :return: None
+        """
+        if self._overflows != self._overflows_counted:
+            overflows = self._overflows
+            self.probes.count('audio_overflows', overflows - self._overflows_counted)
+            self._overflows_counted = overflows
+
+        if self._chunks_written == self._chunks_analyzed:
+            if (self.stream is not None and
+                    time.monotonic() - self._last_audio > self.STALL_SECONDS):
+                # PortAudio stops calling back when the device goes away
+                raise AudioStreamError("no audio from the input device for {:.1f}s".format(
+                    time.monotonic() - self._last_audio))
+            return
+
+        if self.stream is not None:
+            self._last_audio = time.monotonic()
+        with self._ring_lock:
+            self._chunks_analyzed = self._chunks_written
+            if self.sliding is None or self.spectrum is not None:
+                # oldest audio first, the levels do not care but the spectrum does
+                tail = len(self._ring) - self._ring_pos
+                self._capture_view[:tail] = self._ring_view[self._ring_pos:]
+                self._capture_view[tail:] = self._ring_view[:self._ring_pos]
+            # the clip count and the stateful meters only look at the audio since the last read
+            fresh = self._copy_fresh()
+
+        self._get_current_levels(self._capture, fresh)
+
+    def _copy_fresh(self):
+        """
+        Copy the audio written since the last read out of the ring in the order it arrived,
+        the caller holds _ring_lock. Audio older than the ring is lost
+        :return: memoryview of the fresh audio
+        """
+        ring_len = len(self._ring)
+        size = min(self._bytes_written - self._bytes_analyzed, ring_len)
+        self._bytes_analyzed = self._bytes_written
+        start = (self._ring_pos - size) % ring_len
+        first = min(size, ring_len - start)
+        self._fresh_view[:first] = self._ring_view[start:start + first]
+        self._fresh_view[first:size] = self._ring_view[:size - first]
+        return self._fresh_view[:size]
+
+    def _get_current_levels(self, data, fresh=None):
+
+        if self.sliding is not None:
+            clipped = self.sliding.process(fresh)
+            self.peaks, self.rms, self.dbfs = self.sliding.peak, self.sliding.rms, \
+                self.sliding.dbfs
+        else:
+            self.peaks, self.rms, self.dbfs = meter_levels.channel_levels(data, self.channels,
+                                                                          self._scratch)
+            # the ring holds record_seconds of audio, a clip stays in it for several reads
+            # but is only counted by the read that found it new
+            if fresh is None or fresh is data:
+                clipped = self.peaks >= 1.0
+            else:
+                clipped = meter_levels.clipped(fresh, self.channels)
+        for channel in range(self.channels):
+            self.clips[channel] += int(clipped[channel])
+
+        new_pcm = meter_levels.pcm_view(fresh if fresh is not None else data, self.channels)
+        if self.ballistics is not None and fresh is not None:
+            self.meter_db = self.ballistics.process(new_pcm)
+        elif self.ballistics is None:
+            self.meter_db = self.dbfs
+        self.levels = [meter_levels.dbfs_to_bars(dbfs) for dbfs in self.meter_db]
+        if self.spectrum is not None:
+            self.band_levels = self.spectrum.process(data)
+
+        # a mono stream drives both sides of the meter
+        self.level_left = self.levels[0]
+        self.level_right = self.levels[1] if self.channels > 1 else self.levels[0]
+
+        # Use the levels to set the peaks, they fall by the duration of the new audio like the
+        # ballistics
+        fall = self.PEAK_FALL_PER_SECOND * len(new_pcm) / self.sample_rate
         if self.level_left > self.peak_left:
             self.peak_left = self.level_left
         elif self.peak_left > 0:
-            self.peak_left = self.peak_left - 0.2
+            self.peak_left = max(0, self.peak_left - fall)
 
         if self.level_right > self.peak_right:
             self.peak_right = self.level_right
         elif self.peak_right > 0:
-            self.peak_right = self.peak_right - 0.2
-
-
-class NullMountpoint:
-    """ This is a basic class to provide null values in the event the Icecast mount points
-    are not available"""
-
-    def __init__(self):
-        self.ServerDescription = "No description available"
-        self.StreamStart = "No Stream Start available"
-        self.ListenerPeak = "No Listener Peak available"
-        self.SlowListeners = "No Slow Listeners available"
+            self.peak_right = max(0, self.peak_right - fall)
 
 
 class IcecastError(Exception):
     pass
 
 
+# Immutable result of one stats poll, replaced as a whole by the poller thread
+IcecastSnapshot = namedtuple('IcecastSnapshot', ['server_start', 'Mount', 'refresh_time'])
+
+
 class IcecastInfo:
     """ IcecastInfo uses requests.get to obtan information from the Icecast admin page and
-    child mountpoints """
-
-    def __init__(self, name, hostname, port, mountpoint,  username, password, refresh_rate=5):
-        self.request = requests.Session()
+    child mountpoints. The stats are polled on a background thread and published as an
+    IcecastSnapshot so readers never wait on the network """
+
+    def __init__(self, name, hostname, port, mountpoint,  username, password, refresh_rate=5,
+                 max_backoff=60, stream_parse=True, per_mount=None, server_refresh_rate=300,
+                 session=None):
+        # only this poller thread uses the session, IcecastMonitor pools the connections of
+        # all mounts on the same host in the adapter it mounts. Without one the session is
+        # created on the first poll so requests is only imported then
+        self.request = session
         self.headers = {"User-agent": "Mozilla/5.0"}
         self.http_timeout = 2.0
         self.name = name
@@ -425,54 +664,369 @@ class IcecastInfo:
         self.username = username
         self.__password = password
         self.admin_url = "http://{}:{}/admin/stats.xml".format(self.hostname, self.port)
+        self.mount_url = "http://{}:{}/admin/stats".format(self.hostname, self.port)
         self.IceStats = None
-        self.Mount = None
         self.mount_point = mountpoint
-        self.server_start = None
-        self.updating = False
-        # set the refresh time to the current time minus refresh rate so that the refresh can
-        #  happen immediately if needed
-        self.refresh_time = datetime.now() - timedelta(seconds=refresh_rate)
+        self._mount_key = '/{}'.format(mountpoint.lower())
+        # stream_parse=True parses stats.xml incrementally while it downloads, False builds
+        # the whole tree like before
+        self.stream_parse = stream_parse
+        self.chunk_size = 8192
+        # per_mount: None = probe the per-mount stats endpoint, True = use it, False = only
+        # use stats.xml
+        self.per_mount = per_mount
+        self.server_refresh_rate = server_refresh_rate
+        self._global_time = None
+        self._body_hash = None
+        self.snapshot = IcecastSnapshot(server_start=None, Mount=None, refresh_time=None)
         self.refresh_rate = refresh_rate
+        self.max_backoff = max_backoff
+        self.error_count = 0
+        self.last_error = None
+        self.poll_histogram = Histogram()  # duration of every poll, written by the poller only
+        self._poller = None
+        self._stop_event = threading.Event()
+
+    @property
+    def Mount(self):
+        return self.snapshot.Mount
+
+    @property
+    def server_start(self):
+        return self.snapshot.server_start
+
+    @property
+    def refresh_time(self):
+        return self.snapshot.refresh_time
+
+    @property
+    def updating(self):
+        return self._poller is not None and self._poller.is_alive()
 
     def run(self):
+        """
+        Poll the stats once and publish a new snapshot. Blocks for up to http_timeout per
+        request. The per-mount endpoint is tried first, the server wide stats.xml is used when
+        the server does not support it, when server_start is still unknown and every
+        server_refresh_rate seconds to pick up server restarts
+        :return: None
+        """
+        now = datetime.now()
+        global_due = self.snapshot.server_start is None or self._global_time is None or \
+            (now - self._global_time).total_seconds() >= self.server_refresh_rate
+
+        if self.per_mount and not global_due and self._run_mount():
+            return
+
+        found_mount = self._run_global()
+        self._global_time = now
+        if found_mount and self.per_mount is None:
+            # stats.xml has the mount so the per-mount endpoint should have too
+            self.per_mount = self._run_mount()
+
+    def _get(self, url, params=None, stream=False):
+        import requests
+        from requests.exceptions import RequestException
+        if self.request is None:
+            self.request = requests.Session()
         try:
-            req = self.request.get(self.admin_url, auth=(self.username, self.__password),
-                                   headers=self.headers, timeout=self.http_timeout)
-        except ConnectionError as e:
+            req = self.request.get(url, params=params, auth=(self.username, self.__password),
+                                   headers=self.headers, timeout=self.http_timeout,
+                                   stream=stream)
+        except RequestException as e:
             raise IcecastError(e)
         if req.status_code == 401:
+            req.close()
             raise IcecastError("Authentication Failed.")
-        elif req.status_code != 200:
-            raise IcecastError("Unknown Error.")
+        return req
+
+    def _publish(self, server_start, mount, body_hash=None):
+        """
+        Publish a new snapshot, the parsing is skipped when the response body is unchanged
+        :param server_start: server_start text
+        :param mount: <source> element of the configured mount or None
+        :param body_hash: digest of the response body the values were parsed from
+        :return: None
+        """
+        # a single attribute assignment, readers either see the old or the new snapshot
+        self.snapshot = IcecastSnapshot(server_start=server_start,
+                                        Mount=IcecastMount(mount, self) if mount is not None
+                                        else None,
+                                        refresh_time=datetime.now())
+        self._body_hash = body_hash
+
+    def _run_mount(self):
+        """
+        Poll /admin/stats?mount=/<mount>, which only holds the configured mount
+        :return: True when the snapshot was refreshed, False when the endpoint did not answer
+                 for the mount
+        """
+        from requests.exceptions import RequestException
+        req = self._get(self.mount_url, params={'mount': '/{}'.format(self.mount_point)})
+        try:
+            if req.status_code != 200:
+                return False
+            body = req.content
+        except RequestException as e:
+            raise IcecastError(e)
+        finally:
+            req.close()
+
+        body_hash = hashlib.sha1(body).digest()
+        if body_hash == self._body_hash:
+            self.snapshot = self.snapshot._replace(refresh_time=datetime.now())
+            return True
+
         try:
-            self.IceStats = ET.fromstring(req.text)
-        except:
+            server_start, mount = self._parse_tree(body)
+        except ET.ParseError:
             raise IcecastError("Error parsing xml.")
-        # need to null out the Mounts attribute so that we don't keep growing the list and
-        # run the system out of memory
+        if mount is None:
+            return False
 
-        self.server_start = self.IceStats.find('server_start').text
+        self._publish(server_start or self.snapshot.server_start, mount, body_hash)
+        return True
 
-        # Add this server's mounts
+    def _run_global(self):
+        """
+        Poll the server wide /admin/stats.xml
+        :return: True if the configured mount was found
+        """
+        from requests.exceptions import RequestException
+        req = self._get(self.admin_url, stream=self.stream_parse)
+        try:
+            if req.status_code != 200:
+                raise IcecastError("Unknown Error.")
+            try:
+                if self.stream_parse:
+                    server_start, mount = self._parse_stream(req)
+                    body_hash = None
+                else:
+                    body = req.content
+                    body_hash = hashlib.sha1(body).digest()
+                    if body_hash == self._body_hash:
+                        self.snapshot = self.snapshot._replace(refresh_time=datetime.now())
+                        return self.snapshot.Mount is not None
+                    server_start, mount = self._parse_tree(body)
+            except ET.ParseError:
+                raise IcecastError("Error parsing xml.")
+            except RequestException as e:
+                raise IcecastError(e)
+        finally:
+            req.close()
+
+        self._publish(server_start, mount, body_hash)
+        return mount is not None
+
+    def _parse_tree(self, body):
+        """
+        Parse a whole stats document and search it for the configured mount
+        :param body: response body
+        :return: (server_start, source element or None)
+        """
+        self.IceStats = ET.fromstring(body)
+        mount_stats = None
         for mount in self.IceStats.iter('source'):
-            if mount.get('mount').lower() == '/{}'.format(self.mount_point.lower()):
-                self.Mount = IcecastMount(mount, self)
+            if (mount.get('mount') or '').lower() == self._mount_key:
+                mount_stats = mount
+        return self.IceStats.findtext('server_start'), mount_stats
+
+    def _parse_stream(self, req):
+        """
+        Incrementally parse the stats document as it downloads. Only server_start and the
+        configured mount are kept, every other element is cleared once it has been parsed and
+        the download stops as soon as both have been found
+        :param req: requests.Response opened with stream=True
+        :return: (server_start, source element or None)
+        """
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+        depth = 0
+        in_mount = False
+        server_start = None
+        mount_stats = None
+
+        for chunk in req.iter_content(chunk_size=self.chunk_size):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == 'start':
+                    if depth == 0:
+                        root = elem
+                    elif depth == 1 and elem.tag == 'source' and \
+                            (elem.get('mount') or '').lower() == self._mount_key:
+                        in_mount = True
+                    depth += 1
+                    continue
+
+                depth -= 1
+                if depth == 1:
+                    # a direct child of <icestats> is complete
+                    if elem.tag == 'server_start':
+                        server_start = elem.text
+                    elif in_mount:
+                        mount_stats = elem
+                        in_mount = False
+                    root.clear()
+                    if server_start is not None and mount_stats is not None:
+                        return server_start, mount_stats
+                elif depth > 1 and not in_mount:
+                    # listeners and fields of the other mounts
+                    elem.clear()
+
+        parser.close()
+        return server_start, mount_stats
+
+    def _poll(self):
+        """
+        Poller thread body. Polls every refresh_rate seconds and backs off exponentially up
+        to max_backoff seconds while the server keeps failing
+        :return: None
+        """
+        delay = self.refresh_rate
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                self.run()
+                self.poll_histogram.add(time.perf_counter() - started)
+                self.error_count = 0
+                self.last_error = None
+                delay = self.refresh_rate
+            except IcecastError as e:
+                self.poll_histogram.add(time.perf_counter() - started)
+                self.error_count += 1
+                self.last_error = e
+                delay = min(self.refresh_rate * (2 ** self.error_count), self.max_backoff)
+            self._stop_event.wait(delay)
+
+    def start(self):
+        """
+        Start the background poller thread if it is not already running
+        :return: None
+        """
+        if self.updating:
+            return
+        self._stop_event.clear()
+        self._poller = threading.Thread(target=self._poll, name='IcecastStats', daemon=True)
+        self._poller.start()
 
-        self.refresh_time = datetime.now()
-        self.updating = False
+    def stop(self):
+        self._stop_event.set()
 
     def refresh(self):
-        time_delta = datetime.now() - self.refresh_time
-        if not self.updating and time_delta.total_seconds() >= self.refresh_rate:
-            # set the flag that the thread is running so that it doesn't run again
-            self.updating = True
-            threading.Thread(target=self.run(), name='IcecastStats').start()
+        """
+        Kept for the main loop, the poller thread does the refreshing. This only (re)starts it
+        :return: None
+        """
+        self.start()
 
     def getpw(self):
         return self.__password
 
 
+class IcecastMonitor:
+    """ IcecastMonitor polls every configured server and mount. Each mount has its own
+    IcecastInfo poller thread so the mounts are fetched concurrently. Every poller has its own
+    requests.Session, a Session is not thread safe, but all mounts on the same host share one
+    HTTPAdapter whose connection pool is sized to the number of mounts """
+
+    def __init__(self, servers, refresh_rate=5, page_seconds=10):
+        """
+        :param servers: list of IcecastServerConfig
+        :param refresh_rate: seconds between polls of each mount
+        :param page_seconds: seconds each mount is shown before paging to the next one
+        """
+        self.adapters = {}
+        self.mounts = []
+        for server in servers:
+            for mountpoint in server.mounts:
+                self.mounts.append(IcecastInfo(name='{}-{}'.format(server.server, mountpoint),
+                                               hostname=server.server,
+                                               port=server.port,
+                                               mountpoint=mountpoint,
+                                               username=server.user,
+                                               password=server.pswd,
+                                               refresh_rate=refresh_rate))
+
+        self.page = 0
+        self.page_seconds = page_seconds
+        self.page_time = time.time()
+
+    def _create_sessions(self):
+        """
+        One requests.Session per mount and one pooled HTTPAdapter per host, created on start()
+        so requests is only imported once polling begins
+        :return: None
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        mounts_per_host = {}
+        for ics in self.mounts:
+            host = (ics.hostname, ics.port)
+            mounts_per_host[host] = mounts_per_host.get(host, 0) + 1
+
+        for host, mount_count in mounts_per_host.items():
+            self.adapters[host] = HTTPAdapter(pool_connections=1, pool_maxsize=mount_count)
+
+        for ics in self.mounts:
+            adapter = self.adapters[(ics.hostname, ics.port)]
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            ics.request = session
+
+    def start(self):
+        if not self.adapters:
+            self._create_sessions()
+        for ics in self.mounts:
+            ics.start()
+
+    def stop(self):
+        for ics in self.mounts:
+            ics.stop()
+
+    def refresh(self):
+        """
+        Restart any poller thread that has died, the pollers do the actual refreshing
+        :return: None
+        """
+        for ics in self.mounts:
+            ics.refresh()
+
+    def current(self):
+        """
+        The IcecastInfo of the page being shown, pages advance every page_seconds
+        :return: IcecastInfo
+        """
+        if len(self.mounts) > 1 and self.page_seconds and \
+                time.time() - self.page_time >= self.page_seconds:
+            self.next_page()
+        return self.mounts[self.page]
+
+    def next_page(self):
+        self.page = (self.page + 1) % len(self.mounts)
+        self.page_time = time.time()
+
+    def previous_page(self):
+        self.page = (self.page - 1) % len(self.mounts)
+        self.page_time = time.time()
+
+    def page_label(self):
+        return "{}/{}".format(self.page + 1, len(self.mounts))
+
+    def total_listeners(self):
+        """
+        Sum of the current listeners over every mount that reported a number
+        :return: int
+        """
+        total = 0
+        for ics in self.mounts:
+            mount = ics.snapshot.Mount
+            if mount is not None and mount.Listeners and str(mount.Listeners).isdigit():
+                total += int(mount.Listeners)
+        return total
+
+
 class IcecastMount:
     """Details pertaining to an Icecast Mount."""
 
@@ -516,14 +1070,15 @@ class IcecastListener:
 
 class Logger:
 
-    def __init__(self):
-
-        args = Args()
+    def __init__(self, args):
+        """
+        :param args: the Args already parsed at startup, they are not parsed a second time
+        """
         if args.debug_mode:
             self.log_level = logging.DEBUG
         else:
             self.log_level = logging.INFO
-        self.loggers = []
+        self.loggers = {}
         self.formatter = logging.Formatter("%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s")
         self.logfile_size = int(args.log_size) * 1048576  #convert to Bytes
         self.logfile_keep = args.log_keep
@@ -572,37 +1127,484 @@ class Logger:
         return logger
 
 
+class LatestValue:
+    """ Single slot cell holding the most recent value published by a task. Readers never wait
+    and a slow reader simply skips the values it missed """
+
+    def __init__(self, value=None):
+        self.value = value
+        self.version = 0
+
+    def publish(self, value):
+        self.value = value
+        self.version += 1
+
+
+class MeterRuntime:
+    """ asyncio runtime for the meter. Audio metering, Icecast poll supervision, StreamPlayer
+    supervision and rendering each run as their own task at their own cadence and only share
+    data through LatestValue cells and IcecastSnapshots, so a slow step in one of them never
+    delays the others. Blocking calls are pushed to the default executor. Every task runs at
+    the rate it declared with the FrameScheduler, which lowers the stats and meter rates when the
+    frames do not fit their budget """
+
+    def __init__(self, vu_meter_factory, renderer, icecast_monitor, player,
+                 player_kwargs, framerate=None, supervise_seconds=2, poll_seconds=5,
+                 exporter=None, metrics_seconds=1, min_framerate=None, stats_rate=1,
+                 probes=None, inputs=None):
+        """
+        :param vu_meter_factory: callable returning an opened VUMeter, also used after errors.
+                                 None when inputs are given
+        :param renderer: display.Renderer, already opened
+        :param icecast_monitor: IcecastMonitor
+        :param player: StreamPlayer
+        :param player_kwargs: kwargs for StreamPlayer.play()
+        :param framerate: render frames per second, FRAMERATE by default
+        :param supervise_seconds: seconds between StreamPlayer checks
+        :param poll_seconds: seconds between Icecast poller checks
+        :param exporter: optional MetricsExporter, gets a new snapshot every metrics_seconds
+        :param metrics_seconds: seconds between metrics snapshots
+        :param min_framerate: lowest frames per second under CPU pressure, MIN_FRAMERATE by
+                              default
+        :param stats_rate: Icecast stats redraws per second, the stats only change every few
+                           seconds
+        :param probes: Probes to record into, shared with the VUMeters for their audio events
+        :param inputs: optional meter_inputs.InputFanIn metering several inputs in worker
+                       processes instead of the VUMeter of vu_meter_factory, the first input
+                       drives the main meter
+        """
+        self.vu_meter_factory = vu_meter_factory
+        self.vu_meter = None
+        self.renderer = renderer
+        self.icecast_monitor = icecast_monitor
+        self.player = player
+        self.player_kwargs = player_kwargs
+        framerate = framerate or FRAMERATE
+        # under load the stats are redrawn less often first, then the meter drops frames
+        self.scheduler = FrameScheduler(frame_cadence='meter')
+        self.scheduler.add('stats', stats_rate, min_rate=min(stats_rate, STATS_MIN_RATE))
+        self.scheduler.add('meter', framerate,
+                           min_rate=min_framerate or min(framerate, MIN_FRAMERATE))
+        self.scheduler.add('debug', 2)  # overlay refresh
+        self.scheduler.add('supervise', 1.0 / supervise_seconds)
+        self.scheduler.add('icecast', 1.0 / poll_seconds)
+        self.inputs = inputs
+        if inputs is not None:
+            self.scheduler.add('inputs', 1.0 / supervise_seconds)
+        self.levels = LatestValue((0, 0))
+        self.bands = LatestValue(None)  # (band centres, band levels) when the spectrum is on
+        self.input_frames = LatestValue(None)  # LevelFrame of every input with several inputs
+        self.running = True
+        self.exporter = exporter
+        self.metrics_seconds = metrics_seconds
+        self.frames = 0
+        self.frame_seconds = 0.0
+        # stage timings and event counters, shown by the debug overlay and dumped on SIGUSR1
+        self.probes = probes if probes is not None else Probes()
+        self.debug_overlay = False
+
+    @property
+    def frame_period(self):
+        """ Seconds between frames at the current, possibly degraded, meter rate """
+        return self.scheduler['meter'].period
+
+    def feed_audio(self, data):
+        """
+        pcm_sink for a StreamPlayer decoding to a pipe, hands the audio to the current VUMeter
+        :param data: interleaved paInt16 audio
+        :return: None
+        """
+        vu_meter = self.vu_meter
+        if vu_meter is not None:
+            vu_meter.feed(data)
+
+    async def run(self):
+        """
+        Run every task until the render task stops, e.g. on a quit event
+        :return: None
+        """
+        # the first frame is drawn before the audio device is opened and before the Icecast
+        # pollers import requests, so the meter shows up as early as possible
+        self.first_frame = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.dump_probes)
+        except (NotImplementedError, RuntimeError, AttributeError):
+            pass  # no signals on this platform or not running in the main thread
+        tasks = [asyncio.ensure_future(self.render_task()),
+                 asyncio.ensure_future(self.audio_task() if self.inputs is None else
+                                       self.inputs_task()),
+                 asyncio.ensure_future(self.icecast_task()),
+                 asyncio.ensure_future(self.player_task())]
+        if self.exporter is not None:
+            tasks.append(asyncio.ensure_future(self.metrics_task()))
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()  # re-raise anything that ended a task unexpectedly
+        finally:
+            self.running = False
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.vu_meter is not None:
+                self.vu_meter.close_stream()
+            if self.inputs is not None:
+                await loop.run_in_executor(None, self.inputs.stop)
+            try:
+                loop.remove_signal_handler(signal.SIGUSR1)
+            except (NotImplementedError, RuntimeError, AttributeError):
+                pass
+
+    def poll_histograms(self):
+        """
+        :return: dict of the Icecast poll histograms, one per mount
+        """
+        return {'icecast.poll /{}'.format(ics.mount_point): ics.poll_histogram
+                for ics in self.icecast_monitor.mounts}
+
+    def dump_probes(self, stream=None):
+        """
+        Write the stage timings and counters, the SIGUSR1 handler
+        :param stream: text stream, stderr by default
+        :return: None
+        """
+        stream = stream if stream is not None else sys.stderr
+        stream.write("\n".join(["probes after {:.0f}s, {} frames".format(
+            self.probes.clock() - self.probes.started, self.frames)] +
+            self.probes.format_lines(self.poll_histograms())) + "\n")
+        stream.flush()
+
+    async def audio_task(self):
+        loop = asyncio.get_running_loop()
+        await self.first_frame.wait()
+        self.vu_meter = await loop.run_in_executor(None, self.vu_meter_factory)
+        while self.running:
+            try:
+                started = self.probes.clock()
+                if self.vu_meter.use_callback:
+                    # non-blocking, only analyzes the ring buffer
+                    self.vu_meter.read_stream()
+                else:
+                    await loop.run_in_executor(None, self.vu_meter.read_stream)
+                self.probes.record('audio.read', started)
+                self.levels.publish((self.vu_meter.level_left, self.vu_meter.level_right))
+                if self.vu_meter.spectrum is not None:
+                    self.bands.publish((self.vu_meter.spectrum.centers,
+                                        self.vu_meter.band_levels))
+                if self.player.restart_policy is not None:
+                    self.player.restart_policy.observe_level(max(self.vu_meter.dbfs))
+            except AudioStreamError as e:
+                print(e)
+                # only the stream is reopened, the meter state and PyAudio are kept
+                self.levels.publish((0, 0))
+                await self._recover_audio(loop)
+                continue
+            except Exception as e:
+                print(e)
+                # anything else starts over with a new VUMeter, the old stream is closed first
+                # so its handles do not leak
+                self.probes.count('audio_rebuilds')
+                self.vu_meter.close_stream()
+                await asyncio.sleep(0.1)
+                self.vu_meter = await loop.run_in_executor(None, self.vu_meter_factory)
+                continue
+            # the callback fills the ring in the background so there is no point analyzing it
+            # more often than it is drawn, a blocking read already waited for its audio
+            await asyncio.sleep(self.frame_period if self.vu_meter.use_callback else 0)
+
+    async def _recover_audio(self, loop):
+        """
+        Reopen the input stream of the current VUMeter, retrying with a growing delay while the
+        device is missing
+        :param loop: the running event loop
+        :return: None
+        """
+        delay = 0.1
+        while self.running:
+            started = self.probes.clock()
+            try:
+                await loop.run_in_executor(None, self.vu_meter.recover)
+            except (IOError, OSError, ValueError) as e:
+                print("audio input not available: {}".format(e))
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+            self.probes.record('audio.recover', started)
+            return
+
+    async def inputs_task(self):
+        loop = asyncio.get_running_loop()
+        await self.first_frame.wait()
+        # every worker starts a new interpreter, keep that off the loop
+        await loop.run_in_executor(None, self.inputs.start)
+        while self.running:
+            started = self.probes.clock()
+            frames = self.inputs.read()
+            self.probes.record('inputs.read', started)
+            self.input_frames.publish(frames)
+            main = frames[0]
+            self.levels.publish((main.level_left, main.level_right))
+            if self.player.restart_policy is not None:
+                self.player.restart_policy.observe_level(max(main.dbfs))
+
+            now = loop.time()
+            if self.scheduler.due('inputs', now):
+                # a worker that crashed is started again, in a new interpreter like at start
+                restarted = await loop.run_in_executor(None, self.inputs.refresh)
+                if restarted:
+                    self.probes.count('input_restarts', restarted)
+                self.scheduler.ran('inputs', loop.time())
+            await asyncio.sleep(self.frame_period)
+
+    async def icecast_task(self):
+        loop = asyncio.get_running_loop()
+        await self.first_frame.wait()
+        await loop.run_in_executor(None, self.icecast_monitor.start)
+        while self.running:
+            # the pollers fetch on their own threads, this only restarts any that died
+            started = self.probes.clock()
+            self.icecast_monitor.refresh()
+            self.probes.record('icecast.refresh', started)
+            self.scheduler.ran('icecast', loop.time())
+            await asyncio.sleep(self.scheduler.delay('icecast', loop.time()))
+
+    async def player_task(self):
+        loop = asyncio.get_running_loop()
+        player_exited = asyncio.Event()
+        # the StreamPlayer watcher thread reports an mplayer exit right away, the timeout only
+        # covers the periodic is_playing() checks
+        self.player.on_exit = lambda: loop.call_soon_threadsafe(player_exited.set)
+        try:
+            while self.running:
+                try:
+                    # the restart policy may sample mplayer's CPU and memory, keep that off the
+                    # loop
+                    started = self.probes.clock()
+                    playing = await loop.run_in_executor(None, self.player.is_playing)
+                    self.probes.record('player.is_playing', started)
+                    if not playing:
+                        if self.player.restart_reason:
+                            print("restarting mplayer: {}".format(self.player.restart_reason))
+                            self.player.restart_reason = None
+                        self.probes.count('player_restarts')
+                        started = self.probes.clock()
+                        await loop.run_in_executor(
+                            None, lambda: self.player.play(**self.player_kwargs))
+                        self.probes.record('player.play', started)
+                except Exception as e:
+                    print(e)
+                self.scheduler.ran('supervise', loop.time())
+                try:
+                    await asyncio.wait_for(player_exited.wait(),
+                                           self.scheduler.delay('supervise', loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                player_exited.clear()
+        finally:
+            # the loop is closed once the runtime returns, mplayer exits after that are not ours
+            self.player.on_exit = None
+
+    def metrics_snapshot(self):
+        """
+        Collect the current metrics into a new dict for the MetricsExporter
+        :return: dict
+        """
+        vu_meter = self.vu_meter
+        channels = []
+        peak_hold = {}
+        meter_mode = None
+        loudness = {}
+        if vu_meter is not None:
+            rms_dbfs = meter_levels.to_dbfs(vu_meter.rms)
+            for channel in range(vu_meter.channels):
+                channels.append({'channel': channel,
+                                 'peak_dbfs': float(vu_meter.dbfs[channel]),
+                                 'rms_dbfs': float(rms_dbfs[channel]),
+                                 'meter_db': float(vu_meter.meter_db[channel]),
+                                 'clips': vu_meter.clips[channel]})
+            peak_hold = {'left': vu_meter.peak_left, 'right': vu_meter.peak_right}
+            meter_mode = vu_meter.meter_mode
+            if vu_meter.meter_mode == 'lufs':
+                loudness = {'momentary': float(vu_meter.ballistics.momentary),
+                            'short_term': float(vu_meter.ballistics.short_term),
+                            'integrated': vu_meter.ballistics.integrated}
+
+        mounts = []
+        for ics in self.icecast_monitor.mounts:
+            mount = ics.snapshot.Mount
+            mounts.append({'server': '{}:{}'.format(ics.hostname, ics.port),
+                           'mount': ics.mount_point,
+                           'listeners': mount.Listeners if mount else None,
+                           'listener_peak': mount.ListenerPeak if mount else None,
+                           'slow_listeners': mount.SlowListeners if mount else None,
+                           'poll_errors': ics.error_count})
+
+        inputs = []
+        now = time.time()
+        for frame in self.input_frames.value or []:
+            inputs.append({'input': frame.name,
+                           'channels': [{'channel': channel,
+                                         'peak_dbfs': float(frame.dbfs[channel]),
+                                         'meter_db': float(frame.meter_db[channel]),
+                                         'clips': frame.clips[channel]}
+                                        for channel in range(len(frame.dbfs))],
+                           'overflows': frame.overflows,
+                           'recoveries': frame.recoveries,
+                           'age': now - frame.time if frame.time else None})
+
+        return {'time': now,
+                'channels': channels,
+                'inputs': inputs,
+                'peak_hold': peak_hold,
+                'meter_mode': meter_mode,
+                'loudness': loudness,
+                'mounts': mounts,
+                'frames': self.frames,
+                'frame_seconds': self.frame_seconds,
+                'probes': self.probes.snapshot(self.poll_histograms()),
+                'rates': self.scheduler.rates(),
+                'frame_load': self.scheduler.load,
+                'player_running': self.player.running}
+
+    async def metrics_task(self):
+        while self.running:
+            self.exporter.publish(self.metrics_snapshot())
+            await asyncio.sleep(self.metrics_seconds)
+
+    async def render_task(self):
+        loop = asyncio.get_running_loop()
+        probes = self.probes
+        scheduler = self.scheduler
+        meter = scheduler['meter']
+        debug_rows = None
+        while self.running:
+            now = loop.time()
+            # time the loop was held up by other tasks past the deadline counts against the
+            # frame budget as well
+            late = now - meter.deadline if meter.deadline is not None else 0.0
+            frame_start = probes.clock()
+            for action in self.renderer.poll_events():
+                if action == Renderer.QUIT:
+                    return
+                elif action == Renderer.NEXT_PAGE:
+                    self.icecast_monitor.next_page()
+                    scheduler['stats'].invalidate()
+                elif action == Renderer.PREVIOUS_PAGE:
+                    self.icecast_monitor.previous_page()
+                    scheduler['stats'].invalidate()
+                elif action == Renderer.REDRAW:
+                    scheduler['stats'].invalidate()
+                elif action == Renderer.TOGGLE_DEBUG:
+                    self.debug_overlay = not self.debug_overlay
+                    scheduler['debug'].invalidate()
+            probes.record('render.events', frame_start)
+
+            started = probes.clock()
+            level_left, level_right = self.levels.value
+            dirty_rects = self.renderer.draw_levels(level_left, level_right)
+            if self.bands.value is not None:
+                dirty_rects += self.renderer.draw_spectrum(*self.bands.value)
+            if self.input_frames.value is not None:
+                dirty_rects += self.renderer.draw_inputs(self.input_frames.value)
+            probes.record('render.levels', started)
+
+            # the stats only change every few seconds, they are not redrawn every frame
+            if scheduler.due('stats', now):
+                started = probes.clock()
+                if len(self.icecast_monitor.mounts) > 1:
+                    dirty_rects += self.renderer.draw_stats(
+                        self.icecast_monitor.current(),
+                        page=self.icecast_monitor.page_label(),
+                        total_listeners=self.icecast_monitor.total_listeners())
+                else:
+                    dirty_rects += self.renderer.draw_stats(self.icecast_monitor.current())
+                probes.record('render.stats', started)
+                scheduler.ran('stats', now)
+
+            if self.debug_overlay:
+                if scheduler.due('debug', now):
+                    debug_rows = probes.table_rows(self.poll_histograms())
+                    scheduler.ran('debug', now)
+                dirty_rects += self.renderer.draw_debug(debug_rows)
+            elif debug_rows is not None:
+                dirty_rects += self.renderer.draw_debug(None)  # clear the overlay
+                scheduler['stats'].invalidate()
+                debug_rows = None
+
+            started = probes.clock()
+            self.renderer.update(dirty_rects)
+            probes.record('render.update', started)
+            self.first_frame.set()
+            self.frames += 1
+            self.frame_seconds = probes.record('render.frame', frame_start)
+
+            # sleep until the next frame deadline, after an overrun start counting from now
+            now = loop.time()
+            missed = meter.ran(now)
+            if missed:
+                probes.count('overruns')
+                # whole frame periods that passed without a frame
+                if missed > 1:
+                    probes.count('dropped_frames', missed - 1)
+            change = scheduler.adapt(self.frame_seconds + max(0.0, late), now)
+            if change is not None:
+                probes.count('quality_' + change + 's')
+            await asyncio.sleep(meter.delay(loop.time()))
+
+
 def main():
     args = Args()
-    # create the main VUMeter object to be used
-    vu_meter = VUMeter(sample_rate=44100,
-                       channels=1,
-                       buffer_size=4096,
-                       record_seconds=0.2,
-                       input_stream=True)
-    vu_meter.open_stream()  # Open the stream to start reading from it
-
-    # Initilize the IcecastInfo server object
-    icecast_serv = IcecastInfo(name='{}-{}'.format(args.icecast_server, args.mountpoint),
-                               hostname=args.icecast_server,
-                               mountpoint=args.mountpoint,
-                               port=args.port,
-                               username=args.icecast_user,
-                               password=args.get_pwd()
-                               )
-
-    # create the various windows
-    fontSmall = pygame.font.Font('freesansbold.ttf', 12)
-
-    db_Window = dbWindow(window_width=WINDOWWIDTH,
-                         window_height=200,
-                         font=fontSmall,
-                         bg_color=ColorPicker.BLACK)
-    stats_Window = StatsWindow(name="Stats",
-                               xpos=5,
-                               ypos=100,
-                               window_width=WINDOWWIDTH-5,
-                               window_height=240)
+
+    # the sound device has to deliver audio at least once per hop for the sliding window to
+    # update at the hop rate
+    buffer_size = 4096
+    if args.hop_seconds:
+        buffer_size = min(buffer_size, int(SAMPLERATE * args.hop_seconds))
+    # when sliding the ring only has to hold the audio arriving between two reads
+    record_seconds = args.window_seconds
+    if args.hop_seconds:
+        record_seconds = max(record_seconds, 0.2)
+
+    # stage timings and event counters of the runtime and the audio input
+    probes = Probes()
+
+    # VUMeter settings of the single input as well as of every worker of several inputs
+    meter_kwargs = {'sample_rate': SAMPLERATE,
+                    'buffer_size': buffer_size,
+                    'record_seconds': record_seconds,
+                    'input_stream': True,
+                    'use_callback': True,
+                    'meter_mode': args.meter_mode,
+                    'window_seconds': args.window_seconds,
+                    'hop_seconds': args.hop_seconds
+                   }
+
+    def open_vu_meter():
+        # create the main VUMeter object to be used
+        vu_meter = VUMeter(channels=1,
+                           input_source='pipe' if args.pipeline else 'pyaudio',
+                           device_cache=args.device_cache,
+                           spectrum=args.spectrum,
+                           probes=probes,
+                           **meter_kwargs)
+        vu_meter.open_stream()  # Open the stream to start reading from it
+        return vu_meter
+
+    # several inputs are captured and analyzed by worker processes, the runtime only reads
+    # their level frames
+    inputs = None
+    if args.inputs:
+        inputs = InputFanIn(args.inputs, meter_kwargs, rate=args.framerate,
+                            device_cache=args.device_cache)
+
+    # Initilize the Icecast monitor for every configured server and mount
+    # the pollers are started by the runtime once the first frame is on screen
+    icecast_monitor = IcecastMonitor(args.icecast_servers)
+
+    # create the display, pygame is only loaded when the pygame backend is used
+    renderer = create_renderer(args.display_backend, WINDOWWIDTH, WINDOWHEIGHT, version=version)
+    renderer.open()
 
     station_kwargs = {'name': args.stream_name,
                       'uri': 'http://{}:{}/{}'.format(args.icecast_server, args.port,
@@ -610,70 +1612,62 @@ def main():
                       'vumeter_uri': 'http://{}:{}/{}'.format("127.0.0.1", args.port, "vumeter")
                      }
 
-    mplayer_kwargs = {'cache': 320,
-                      'optional_args': ['-ao', 'alsa']
-                      #'optional_args': ['-o', 'alsa', '-a', '0:1']
-                     }
+    if args.pipeline:
+        # mplayer decodes to a pipe that feeds the meter, the loopback device is not used
+        mplayer_kwargs = {'cache': 320,
+                          'optional_args': ['-really-quiet']
+                         }
+    else:
+        mplayer_kwargs = {'cache': 320,
+                          'optional_args': ['-ao', 'alsa']
+                          #'optional_args': ['-o', 'alsa', '-a', '0:1']
+                         }
     station = StationInfo(**station_kwargs)
-    mplayer = StreamPlayer(station)
+    restart_policy = RestartPolicy(max_cpu_percent=args.restart_max_cpu,
+                                   max_rss_growth_mb=args.restart_max_rss_growth,
+                                   silence_seconds=args.restart_silence_seconds,
+                                   silence_dbfs=args.restart_silence_db,
+                                   cooldown_seconds=args.restart_cooldown)
+    mplayer = StreamPlayer(station, restart_policy=restart_policy,
+                           pcm_rate=SAMPLERATE, pcm_channels=1)
+
+    exporter = None
+    if args.metrics_port:
+        exporter = MetricsExporter(host=args.metrics_bind, port=args.metrics_port)
+        exporter.start()
+
+    runtime = MeterRuntime(vu_meter_factory=open_vu_meter if inputs is None else None,
+                           renderer=renderer,
+                           icecast_monitor=icecast_monitor,
+                           player=mplayer,
+                           player_kwargs=mplayer_kwargs,
+                           framerate=args.framerate,
+                           min_framerate=args.min_framerate,
+                           stats_rate=args.stats_rate,
+                           exporter=exporter,
+                           probes=probes,
+                           inputs=inputs)
+    if args.pipeline:
+        mplayer.pcm_sink = runtime.feed_audio
     mplayer.play(**mplayer_kwargs)
-
-    while True:  # main application loop
-
-        # Read the data and calcualte the left and right levels
-        try:
-            try:
-                icecast_serv.refresh()
-                if not mplayer.is_playing():
-                    mplayer.play(**mplayer_kwargs)
-            except:
-                continue
-
-            vu_meter.read_stream()
-
-            # event handling loop for quit events
-            for event in pygame.event.get():
-                if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
-                    pygame.quit()
-                    sys.exit()
-
-            db_Window.draw(LevelL=vu_meter.level_left,
-                           LevelR=vu_meter.level_right
-                          )
-            stats_Window.threaded_draw(icecast_serv)
-            mainWindow.update()
-
-        except BaseException as e:
-            print(e)
-            if isinstance(e, SystemExit):
-                mplayer.stop()
-                break
-            # on occasion pyaudio will receieve an input overrun and this requires a new
-            # pyaudio.PyAudio() object created
-            time.sleep(0.1)
-            vu_meter = VUMeter(sample_rate=44100,
-                               channels=1,
-                               buffer_size=4096,
-                               record_seconds=0.2,
-                               input_stream=True)
-            vu_meter.open_stream()
-
-    # one final stop command to ensure all mplayer processes have been cleaned up
-    mplayer.stop()
+    try:
+        asyncio.run(runtime.run())
+    finally:
+        # one final stop command to ensure all mplayer processes have been cleaned up
+        icecast_monitor.stop()
+        mplayer.stop()
+        if exporter is not None:
+            exporter.stop()
+        renderer.close()
 
 
 # GLOBAL CONSTANTS
 WINDOWWIDTH = 480
 WINDOWHEIGHT = 280
-BGCOLOR = ColorPicker.BLACK
-
-# main window is global to all other windows
-#  therefore this needs to be defined globally
-mainWindow = Window(window_width=WINDOWWIDTH,
-                    window_height=WINDOWHEIGHT,
-                    window_frame=pygame.NOFRAME,
-                    font=pygame.font.Font('freesansbold.ttf', 12),
-                    bg_color=ColorPicker.BLACK)
+FRAMERATE = 30  # main loop frames per second
+MIN_FRAMERATE = 15  # lowest frame rate under CPU pressure
+STATS_MIN_RATE = 0.2  # lowest Icecast stats redraws per second, they update every 5 seconds
+SAMPLERATE = 44100
 
 if __name__ == '__main__':
     main()